@@ -0,0 +1,231 @@
+from . import converter, spill
+
+FUNCTIONS = ('COUNT', 'SUM', 'MIN', 'MAX', 'AVG')
+# A rough allowance (bytes) for the state of one aggregate of a group
+STATE_SIZE = 64
+
+
+class Aggregator():
+    """Computes a list of aggregates over rows as mergeable partial states,
+    so groups spilled to disk part way through can be combined later
+    """
+
+    def __init__(self, aggregates, types):
+        """
+        :param aggregates, a list of dictionaries with function and field
+        keys, e.g. {'function': 'avg', 'field': 'age'} - count doesn't need a
+        field and counts rows
+        :param types, a dictionary of fields and their types, used to compare
+        min and max values
+        """
+        self.aggregates = []
+        for aggregate in aggregates:
+            function = aggregate.get('function', '').upper()
+            if function not in FUNCTIONS:
+                raise ValueError(
+                    'function must be one of {functions}'.format(
+                        functions=', '.join(FUNCTIONS)
+                    )
+                )
+            self.aggregates.append((function, aggregate.get('field')))
+        self.types = types
+        self.names = [
+            '{function}({field})'.format(
+                function=function.lower(),
+                field=field or '*'
+            ) for function, field in self.aggregates
+        ]
+
+    def initial(self):
+        """The state of a group before any rows
+
+        :rtype list, one state per aggregate
+        """
+        return [
+            0 if function == 'COUNT' else
+            [0.0, 0] if function == 'AVG' else
+            None for function, _ in self.aggregates
+        ]
+
+    def update(self, state, row):
+        """Folds a row into the state of its group
+
+        :param state, a list, the state of the group
+        :param row, a dictionary of headers and values
+        """
+        for idx, (function, field) in enumerate(self.aggregates):
+            if function == 'COUNT':
+                if field is None or row[field] != '':
+                    state[idx] += 1
+                continue
+            value = row[field]
+            if value == '':
+                continue
+            if function in ('SUM', 'AVG'):
+                rank, number = converter.convert_to_typed(value, 'numeric')
+                if rank:
+                    continue
+                if function == 'SUM':
+                    state[idx] = (state[idx] or 0.0) + number
+                else:
+                    state[idx][0] += number
+                    state[idx][1] += 1
+            else:
+                typed = converter.convert_to_typed(
+                    value, self.types.get(field, 'string')
+                )
+                state[idx] = self.__pick(function, state[idx], (typed, value))
+
+    def merge(self, state, other):
+        """Combines the state of a group with another partial state of it
+
+        :param state, a list, the state to merge into
+        :param other, a list, a partial state of the same group
+        """
+        for idx, (function, _) in enumerate(self.aggregates):
+            if other[idx] is None:
+                continue
+            if function == 'COUNT':
+                state[idx] += other[idx]
+            elif function == 'SUM':
+                state[idx] = (state[idx] or 0.0) + other[idx]
+            elif function == 'AVG':
+                state[idx][0] += other[idx][0]
+                state[idx][1] += other[idx][1]
+            else:
+                state[idx] = self.__pick(function, state[idx], other[idx])
+
+    def result(self, state):
+        """The final values of a group's aggregates
+
+        :param state, a list, the state of the group
+        :rtype dictionary of aggregate names and values
+        """
+        values = []
+        for (function, _), value in zip(self.aggregates, state):
+            if function == 'AVG':
+                value = value[0] / value[1] if value[1] else None
+            elif function in ('MIN', 'MAX') and value is not None:
+                value = value[1]
+            values.append(value)
+        return dict(zip(self.names, values))
+
+    @staticmethod
+    def __pick(function, current, candidate):
+        """[PRIVATE] Picks the min or max of two typed and raw value pairs"""
+        if current is None:
+            return candidate
+        if function == 'MIN':
+            return candidate if candidate[0] < current[0] else current
+        return candidate if candidate[0] > current[0] else current
+
+
+def hash_aggregate(rows, key, aggregator,
+                   memory_limit=spill.DEFAULT_MEMORY_LIMIT, directory=None):
+    """Groups rows by key and aggregates them with a hash table. When the
+    table outgrows the memory limit its partial states are spilled to disk,
+    partitioned by the hash of the key, and each partition is merged once
+    the rows run out
+
+    :param rows, an iterable of row dictionaries
+    :param key, a function returning the group key of a row
+    :param aggregator, an Aggregator
+    :param memory_limit, an integer of bytes to hold groups in memory
+    :param directory, the directory to spill partitions into
+    :rtype generator of tuples of group key and aggregate results
+    """
+    table = {}
+    size = 0
+    group_size = STATE_SIZE * len(aggregator.aggregates)
+    partitions = None
+    try:
+        for row in rows:
+            group = key(row)
+            state = table.get(group)
+            if state is None:
+                state = table[group] = aggregator.initial()
+                size += spill.record_size(group) + group_size
+            aggregator.update(state, row)
+            if size >= memory_limit:
+                if partitions is None:
+                    partitions = [
+                        spill.SpillFile(directory)
+                        for _ in range(spill.PARTITIONS)
+                    ]
+                _spill_table(table, partitions, 0)
+                table = {}
+                size = 0
+        if partitions is None:
+            for group, state in table.items():
+                yield group, aggregator.result(state)
+            return
+        _spill_table(table, partitions, 0)
+        table = None
+        for partition in partitions:
+            yield from _merge_partition(
+                partition, aggregator, memory_limit, directory, 1
+            )
+    finally:
+        for partition in partitions or []:
+            partition.close()
+
+
+def _spill_table(table, partitions, level):
+    """Writes the groups of a table to partitions by the hash of their key
+
+    :param table, a dictionary of group keys and states
+    :param partitions, a list of SpillFiles
+    :param level, an integer, how many times the groups were partitioned
+    """
+    for group, state in table.items():
+        partitions[spill.partition_of(group, level)].write((group, state))
+
+
+def _merge_partition(partition, aggregator, memory_limit, directory, level):
+    """Merges the partial states of a spilled partition, splitting it again
+    if its groups don't fit the memory limit
+
+    :param partition, a SpillFile of group keys and partial states
+    :param aggregator, an Aggregator
+    :param memory_limit, an integer of bytes to hold groups in memory
+    :param directory, the directory to spill partitions into
+    :param level, an integer, how many times the groups were partitioned
+    :rtype generator of tuples of group key and aggregate results
+    """
+    table = {}
+    size = 0
+    group_size = STATE_SIZE * len(aggregator.aggregates)
+    groups = iter(partition)
+    for group, state in groups:
+        current = table.get(group)
+        if current is None:
+            table[group] = state
+            size += spill.record_size(group) + group_size
+        else:
+            aggregator.merge(current, state)
+        if (
+            size >= memory_limit and len(table) > 1 and
+            level < spill.MAX_LEVEL
+        ):
+            # Split this partition further and merge the pieces instead
+            partitions = [
+                spill.SpillFile(directory) for _ in range(spill.PARTITIONS)
+            ]
+            try:
+                _spill_table(table, partitions, level)
+                for group, state in groups:
+                    partitions[spill.partition_of(group, level)].write(
+                        (group, state)
+                    )
+                table = None
+                for sub_partition in partitions:
+                    yield from _merge_partition(
+                        sub_partition, aggregator, memory_limit, directory,
+                        level + 1
+                    )
+            finally:
+                for sub_partition in partitions:
+                    sub_partition.close()
+            return
+    for group, state in table.items():
+        yield group, aggregator.result(state)
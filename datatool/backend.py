@@ -0,0 +1,409 @@
+import datetime
+import json
+import os
+import sqlite3
+from functools import lru_cache
+from dateutil.parser import parse
+
+TABLE = 'data'
+META_TABLE = 'datatool_meta'
+DEFAULT_BATCH_SIZE = 10000
+# Date fields get a shadow column of ISO 8601 text, which sorts like dates
+DATE_PREFIX = '__date__'
+# Numeric fields get a shadow column of the numbers float reads, NULL for the
+# values it can't - SQLite's CAST reads 'n/a' as 0 and '12abc' as 12
+NUMBER_PREFIX = '__number__'
+
+
+def quote(identifier):
+    """Quotes an SQL identifier (i.e. a header with spaces)
+
+    :param identifier, a string
+    :rtype string
+    """
+    return '"{identifier}"'.format(identifier=identifier.replace('"', '""'))
+
+
+@lru_cache(maxsize=4096)
+def to_iso(value):
+    """Converts a date string to ISO 8601 text, None if it isn't a date
+
+    :param value, a string
+    :rtype string
+    """
+    try:
+        return parse(value).isoformat()
+    except (ValueError, OverflowError):
+        return None
+
+
+def to_number(value):
+    """Converts a string to the number the scan compares it as, None if
+    float can't read it (or reads it as NaN, which compares as nothing)
+
+    :param value, a string
+    :rtype float
+    """
+    try:
+        number = float(value)
+    except (ValueError, TypeError):
+        return None
+    return None if number != number else number
+
+
+class SQLiteBackend():
+    """Holds a data file in an SQLite table for repeated querying, every
+    value is stored as the text the scan would read, with typed comparisons
+    made through shadow columns of the numbers float reads for numeric
+    fields and of ISO 8601 dates for date fields - so results match a scan
+    of the text file. Fields of other types are converted the same way as
+    they're compared, through the to_number and to_iso SQL functions
+    """
+
+    def __init__(self, path, create=False):
+        """
+        :param path, the path to the SQLite database
+        :param create, a boolean, True opens (or creates) a database to load,
+        otherwise it must already hold a load
+        :raises ValueError, when not creating and the database doesn't exist
+        or wasn't loaded
+        """
+        if not create and path != ':memory:' and not os.path.exists(path):
+            raise ValueError(
+                'database {path} does not exist, load it with '
+                'to_sqlite'.format(path=path)
+            )
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.create_function(
+            'to_number', 1, to_number, deterministic=True
+        )
+        self.connection.create_function(
+            'to_iso', 1, to_iso, deterministic=True
+        )
+        self.headers = []
+        self.types = {}
+        # Temporary tables of the values of IN / NOT_IN clauses
+        self.__value_tables = []
+        try:
+            meta = dict(self.connection.execute(
+                'SELECT key, value FROM {meta}'.format(meta=META_TABLE)
+            ))
+        except sqlite3.OperationalError:
+            meta = {}
+        if meta:
+            self.headers = json.loads(meta['headers'])
+            self.types = json.loads(meta['types'])
+        elif not create:
+            self.connection.close()
+            raise ValueError(
+                'database {path} was not loaded by to_sqlite'.format(
+                    path=path
+                )
+            )
+
+    def load(self, headers, types, rows, indexes=None,
+             batch_size=DEFAULT_BATCH_SIZE):
+        """Bulk loads rows into a fresh table, in one transaction through
+        batched executemany calls, building the indexes once loaded
+
+        :param headers, a list of the headers in order
+        :param types, a dictionary of headers and their inferred types
+        :param rows, an iterable of dictionaries of headers and values
+        :param indexes, a list of headers to index
+        :param batch_size, an integer of rows per executemany
+        :rtype integer of rows loaded
+        """
+        date_fields = [
+            field for field in headers if types.get(field) == 'date'
+        ]
+        numeric_fields = [
+            field for field in headers if types.get(field) == 'numeric'
+        ]
+        columns = [quote(field) + ' TEXT' for field in headers] + [
+            quote(DATE_PREFIX + field) + ' TEXT' for field in date_fields
+        ] + [
+            quote(NUMBER_PREFIX + field) + ' REAL' for field in numeric_fields
+        ]
+        connection = self.connection
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        with connection:
+            connection.execute('DROP TABLE IF EXISTS {table}'.format(
+                table=TABLE
+            ))
+            connection.execute('DROP TABLE IF EXISTS {meta}'.format(
+                meta=META_TABLE
+            ))
+            connection.execute('CREATE TABLE {table} ({columns})'.format(
+                table=TABLE,
+                columns=', '.join(columns)
+            ))
+            insert = 'INSERT INTO {table} VALUES ({values})'.format(
+                table=TABLE,
+                values=', '.join('?' for _ in columns)
+            )
+            loaded = 0
+            batch = []
+            for row in rows:
+                batch.append(
+                    [row[field] for field in headers] +
+                    [to_iso(row[field]) for field in date_fields] +
+                    [to_number(row[field]) for field in numeric_fields]
+                )
+                if len(batch) >= batch_size:
+                    connection.executemany(insert, batch)
+                    loaded += len(batch)
+                    batch = []
+            connection.executemany(insert, batch)
+            loaded += len(batch)
+            for field in indexes or []:
+                self.__create_index(field, types.get(field))
+            connection.execute(
+                'CREATE TABLE {meta} (key TEXT, value TEXT)'.format(
+                    meta=META_TABLE
+                )
+            )
+            connection.executemany(
+                'INSERT INTO {meta} VALUES (?, ?)'.format(meta=META_TABLE),
+                [
+                    ('headers', json.dumps(headers)),
+                    ('types', json.dumps(types))
+                ]
+            )
+        self.headers = headers
+        self.types = types
+        return loaded
+
+    def __create_index(self, field, data_type):
+        """[PRIVATE] Indexes a field, and its shadow column for numeric and
+        date fields"""
+        expressions = [quote(field)]
+        if data_type == 'numeric':
+            expressions.append(quote(NUMBER_PREFIX + field))
+        elif data_type == 'date':
+            expressions.append(quote(DATE_PREFIX + field))
+        for idx, expression in enumerate(expressions):
+            self.connection.execute(
+                'CREATE INDEX {name} ON {table} ({expression})'.format(
+                    name=quote('idx_{field}_{idx}'.format(
+                        field=field, idx=idx
+                    )),
+                    table=TABLE,
+                    expression=expression
+                )
+            )
+
+    def __typed(self, field, data_type):
+        """[PRIVATE] The SQL expression of a field's values as numbers or
+        ISO 8601 dates, NULL for values that aren't - the shadow column when
+        the field was loaded as that type, else a conversion of its text
+
+        :param field, a field in the table
+        :param data_type, a string, numeric or date
+        :rtype string
+        """
+        prefix, function = {
+            'numeric': (NUMBER_PREFIX, 'to_number'),
+            'date': (DATE_PREFIX, 'to_iso')
+        }[data_type]
+        if self.types.get(field) == data_type:
+            return quote(prefix + field)
+        return '{function}({field})'.format(
+            function=function, field=quote(field)
+        )
+
+    def __condition(self, query):
+        """[PRIVATE] Translates a where clause into SQL and its parameters
+
+        :param query, a prepared where clause with field, condition and value
+        :rtype tuple of the SQL string and a list of parameters
+        """
+        field = quote(query['field'])
+        condition = query['condition']
+        value = query.get('value')
+        if condition == 'CONTAINS':
+            return 'instr({field}, ?) > 0'.format(field=field), [value]
+        elif condition == 'EQUALS':
+            return '{field} = ?'.format(field=field), [value]
+        elif condition == 'NOT':
+            return '{field} != ?'.format(field=field), [value]
+        elif condition in ('GREATER', 'LESS'):
+            return (
+                '{field} {operator} ?'.format(
+                    field=self.__typed(query['field'], 'numeric'),
+                    operator='>' if condition == 'GREATER' else '<'
+                ),
+                [value]
+            )
+        elif condition in ('BEFORE', 'AFTER'):
+            return (
+                '{field} {operator} ?'.format(
+                    field=self.__typed(query['field'], 'date'),
+                    operator='<' if condition == 'BEFORE' else '>'
+                ),
+                [value.isoformat()]
+            )
+        elif condition == 'BETWEEN':
+            low, high = value
+            if isinstance(low, float):
+                expression = self.__typed(query['field'], 'numeric')
+            elif isinstance(low, datetime.datetime):
+                expression = self.__typed(query['field'], 'date')
+                low, high = low.isoformat(), high.isoformat()
+            else:
+                expression = field
+            return (
+                '({expression} BETWEEN ? AND ?)'.format(expression=expression),
+                [low, high]
+            )
+        elif condition in ('IN', 'NOT_IN'):
+            return (
+                '{field} {operator} {table}'.format(
+                    field=field,
+                    operator='IN' if condition == 'IN' else 'NOT IN',
+                    table=self.__value_table(value)
+                ),
+                []
+            )
+        raise ValueError(
+            'condition {condition} can not be translated'.format(
+                condition=condition
+            )
+        )
+
+    def __value_table(self, values):
+        """[PRIVATE] Loads the values of a membership clause into an indexed
+        temporary table, however many there are they're never bound as
+        parameters
+
+        :param values, a frozenset of strings
+        :rtype string, the name of the table
+        """
+        table = 'temp.{name}'.format(name=quote(
+            'values_{idx}'.format(idx=len(self.__value_tables))
+        ))
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE {table} (value TEXT PRIMARY KEY) '
+                'WITHOUT ROWID'.format(table=table)
+            )
+            self.connection.executemany(
+                'INSERT INTO {table} VALUES (?)'.format(table=table),
+                ((value, ) for value in values)
+            )
+        self.__value_tables.append(table)
+        return table
+
+    def __drop_value_tables(self):
+        """[PRIVATE] Drops the value tables of the last select"""
+        for table in self.__value_tables:
+            self.connection.execute('DROP TABLE {table}'.format(table=table))
+        self.__value_tables = []
+
+    def __order(self, field, descending):
+        """[PRIVATE] The ORDER BY terms of a field, values that don't fit the
+        field's type order last (first when descending) like the text scan"""
+        direction = ' DESC' if descending else ''
+        data_type = self.types.get(field)
+        if data_type in ('numeric', 'date'):
+            field = self.__typed(field, data_type)
+            terms = ['{field} IS NULL', '{field}']
+        else:
+            field = quote(field)
+            terms = ['{field}']
+        return [term.format(field=field) + direction for term in terms]
+
+    def select(self, fields, where, match_all=True, order=None,
+               dedupe_on=None):
+        """Selects rows matching where clauses
+
+        :param fields, a list of the fields to return
+        :param where, a list of prepared where clauses
+        :param match_all, a boolean, True ANDs the clauses, False ORs them
+        :param order, a list of tuples of field and descending
+        :param dedupe_on, a list of fields, only the first row of each
+        distinct set of their values is returned
+        :rtype generator of dictionaries of fields and values
+        """
+        self.__drop_value_tables()
+        conditions = []
+        parameters = []
+        for query in where:
+            sql, values = self.__condition(query)
+            conditions.append(sql)
+            parameters.extend(values)
+        clause = (' AND ' if match_all else ' OR ').join(conditions) or '1'
+        if dedupe_on:
+            clause = (
+                '({clause}) AND rowid IN ('
+                'SELECT MIN(rowid) FROM {table} WHERE {clause} '
+                'GROUP BY {keys})'
+            ).format(
+                clause=clause,
+                table=TABLE,
+                keys=', '.join(quote(field) for field in dedupe_on)
+            )
+            parameters = parameters * 2
+        terms = []
+        for field, descending in order or []:
+            terms.extend(self.__order(field, descending))
+        terms.append('rowid')
+        # A scan hands back dates it compared as parsed datetimes, so do the
+        # same for fields in BEFORE / AFTER clauses
+        parsed = {
+            query['field'] for query in where
+            if query['condition'] in ('BEFORE', 'AFTER')
+        }
+        parsed = [field for field in fields if field in parsed]
+        columns = [quote(field) for field in fields] + [
+            self.__typed(field, 'date') for field in parsed
+        ]
+        cursor = self.connection.execute(
+            'SELECT {columns} FROM {table} WHERE {clause} '
+            'ORDER BY {terms}'.format(
+                columns=', '.join(columns),
+                table=TABLE,
+                clause=clause,
+                terms=', '.join(terms)
+            ),
+            parameters
+        )
+        count = len(fields)
+        for values in cursor:
+            row = dict(zip(fields, values))
+            for field, iso in zip(parsed, values[count:]):
+                if iso is not None:
+                    row[field] = datetime.datetime.fromisoformat(iso)
+            yield row
+
+    def first_row(self):
+        """The first row loaded, which a scan validates where clauses by
+
+        :rtype dictionary of headers and values, None for an empty table
+        """
+        values = self.connection.execute(
+            'SELECT {columns} FROM {table} ORDER BY rowid LIMIT 1'.format(
+                columns=', '.join(quote(field) for field in self.headers),
+                table=TABLE
+            )
+        ).fetchone()
+        return None if values is None else dict(zip(self.headers, values))
+
+    def value_counts(self, field):
+        """Counts the rows of each distinct value of a field
+
+        :param field, a field in the table
+        :rtype tuple of the total rows and a list of value and count tuples
+        """
+        total = self.connection.execute(
+            'SELECT COUNT(*) FROM {table}'.format(table=TABLE)
+        ).fetchone()[0]
+        counts = self.connection.execute(
+            'SELECT {field}, COUNT(*) FROM {table} GROUP BY {field} '
+            'ORDER BY MIN(rowid)'.format(field=quote(field), table=TABLE)
+        ).fetchall()
+        return total, counts
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,67 @@
+import math
+
+
+class BloomFilter():
+    """A fixed size set of hashable keys that answers membership with no
+    false negatives and a bounded rate of false positives
+    """
+
+    def __init__(self, capacity, error_rate=0.01, max_bits=None):
+        """
+        :param capacity, an integer, how many keys are expected - adding more
+        raises the false positive rate but never loses a key
+        :param error_rate, a float, the false positive rate at capacity
+        :param max_bits, optionally an integer, the most bits to use - a
+        filter capped below the bits the error rate needs has a higher false
+        positive rate at capacity (see expected_error_rate)
+        """
+        capacity = max(int(capacity), 1)
+        self.capacity = capacity
+        self.size = max(int(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2)
+        ), 8)
+        if max_bits is not None:
+            self.size = max(min(self.size, int(max_bits)), 8)
+        self.hashes = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    @property
+    def expected_error_rate(self):
+        """The false positive rate once capacity keys are added
+
+        :rtype float
+        """
+        return (
+            1 - math.exp(-self.hashes * self.capacity / self.size)
+        ) ** self.hashes
+
+    def __positions(self, key):
+        """[PRIVATE] The bit positions of a key, by double hashing"""
+        first = hash(key)
+        second = hash((key, 0x9e3779b9)) | 1
+        size = self.size
+        return [
+            (first + idx * second) % size for idx in range(self.hashes)
+        ]
+
+    def add(self, key):
+        """Adds a key, reporting whether it may have been added before
+
+        :param key, a hashable key
+        :rtype boolean, False when the key definitely wasn't in the filter
+        """
+        bits = self.bits
+        present = True
+        for position in self.__positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not bits[byte] & mask:
+                present = False
+                bits[byte] |= mask
+        return present
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self.__positions(key)
+        )
@@ -0,0 +1,408 @@
+import argparse
+import json
+import os
+import sys
+from . import follow as tail, spill, zonemap
+from .datatool import DataTool
+from .config.exceptions import Error
+
+
+def load_where(args):
+    """Loads the where clauses given on the command line as JSON, either
+    inline or from a file
+
+    :param args, the parsed arguments, with where and where_file
+    :rtype list of dictionaries
+    """
+    if args.where_file is not None:
+        with open(args.where_file, 'r') as f:
+            where = json.load(f)
+    elif args.where is not None:
+        where = json.loads(args.where)
+    else:
+        where = []
+    if isinstance(where, dict):
+        where = [where]
+    if not isinstance(where, list):
+        raise ValueError('Where must be a JSON object or a list of objects')
+    return where
+
+
+def build_datatool(args):
+    """Creates a DataTool over the input of the command, where - is stdin
+
+    :param args, the parsed arguments, with input, terminator and encloser
+    :rtype DataTool
+    """
+    if args.input == '-':
+        return DataTool(
+            stream=sys.stdin,
+            terminator=args.terminator,
+            encloser=args.encloser
+        )
+    return DataTool(
+        filename=args.input,
+        terminator=args.terminator,
+        encloser=args.encloser
+    )
+
+
+def run_query(args):
+    datatool = build_datatool(args)
+    outfile = sys.stdout if args.outfile == '-' else args.outfile
+    result = datatool.query(
+        fields=args.fields,
+        where=load_where(args),
+        match_all=not args.any,
+        outfile=outfile,
+        order_by=args.order_by,
+        memory_limit=args.memory_limit,
+        distinct=args.distinct,
+        dedupe_on=args.dedupe_on,
+        pipeline=args.pipeline
+    )
+    if outfile is not sys.stdout:
+        print(json.dumps(result))
+    else:
+        sys.stdout.flush()
+        if args.pipeline:
+            # The rows went to stdout, so the stalls go to stderr
+            print(json.dumps(result['pipeline']), file=sys.stderr)
+
+
+def run_follow(args):
+    datatool = build_datatool(args)
+    outfile = sys.stdout if args.outfile == '-' else args.outfile
+    try:
+        datatool.follow(
+            fields=args.fields,
+            where=load_where(args),
+            match_all=not args.any,
+            outfile=outfile,
+            from_start=args.from_start,
+            poll_interval=args.poll_interval,
+            max_interval=args.max_interval,
+            inotify=not args.poll
+        )
+    except KeyboardInterrupt:
+        # Following runs until interrupted, which is how it's meant to end
+        pass
+
+
+def run_zone_map(args):
+    datatool = build_datatool(args)
+    print(json.dumps(
+        datatool.build_zone_map(args.fields, block_size=args.block_size)
+    ))
+
+
+def run_statistics(args):
+    datatool = build_datatool(args)
+    search = {'regex': args.regex}
+    if args.group_idx is not None:
+        search['group_idx'] = args.group_idx
+    stats = datatool.statistics(
+        field=args.field,
+        search=search,
+        return_type=args.return_type,
+        top=args.top,
+        sample=args.sample,
+        confidence=args.confidence,
+        seed=args.seed
+    )
+    print(json.dumps(stats))
+
+
+def parse_aggregate(aggregate):
+    """Parses an aggregate given on the command line, as the function with
+    an optional field in brackets i.e. count or avg(age)
+
+    :param aggregate, a string
+    :rtype dictionary of function and field
+    """
+    function, _, field = aggregate.partition('(')
+    parsed = {'function': function.strip()}
+    field = field.rstrip(')').strip()
+    if field and field != '*':
+        parsed['field'] = field
+    return parsed
+
+
+def run_group_by(args):
+    datatool = build_datatool(args)
+    outfile = sys.stdout if args.outfile == '-' else args.outfile
+    result = datatool.group_by(
+        fields=args.by,
+        aggregates=[parse_aggregate(item) for item in args.aggregate],
+        where=load_where(args),
+        match_all=not args.any,
+        outfile=outfile,
+        memory_limit=args.memory_limit
+    )
+    if outfile is not sys.stdout:
+        print(json.dumps(result))
+    else:
+        sys.stdout.flush()
+
+
+def run_join(args):
+    datatool = build_datatool(args)
+    other = DataTool(
+        filename=args.other,
+        terminator=args.other_terminator or args.terminator,
+        encloser=args.other_encloser or args.encloser
+    )
+    on = args.on[0] if len(args.on) == 1 else tuple(args.on)
+    outfile = sys.stdout if args.outfile == '-' else args.outfile
+    result = datatool.join(
+        other,
+        on=on,
+        fields=args.fields,
+        how=args.how,
+        outfile=outfile,
+        memory_limit=args.memory_limit
+    )
+    if outfile is not sys.stdout:
+        print(json.dumps(result))
+    else:
+        sys.stdout.flush()
+
+
+def build_parser():
+    """Builds the argument parser for the datatool command
+
+    :rtype argparse.ArgumentParser
+    """
+    parser = argparse.ArgumentParser(
+        prog='datatool',
+        description='Query and calculate statistics on text data files, '
+                    'reading from stdin when no input (or -) is given'
+    )
+    source = argparse.ArgumentParser(add_help=False)
+    source.add_argument(
+        'input', nargs='?', default='-',
+        help='the data file to read, - for stdin (default)'
+    )
+    source.add_argument(
+        '-t', '--terminator', default=',',
+        help='the character terminating fields (default ,)'
+    )
+    source.add_argument(
+        '-e', '--encloser', default='\"',
+        help='the character enclosing multiple values (default \")'
+    )
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    filtered = argparse.ArgumentParser(add_help=False)
+    where = filtered.add_mutually_exclusive_group()
+    where.add_argument(
+        '-w', '--where',
+        help='a JSON object, or list of objects, with field, condition and '
+             'value keys'
+    )
+    where.add_argument(
+        '--where-file',
+        help='a path to a JSON file of where clauses'
+    )
+    filtered.add_argument(
+        '--any', action='store_true',
+        help='match rows meeting any where clause (default is all)'
+    )
+    filtered.add_argument(
+        '--memory-limit', type=int, default=spill.DEFAULT_MEMORY_LIMIT,
+        help='the bytes to hold in memory before spilling to disk'
+    )
+    filtered.add_argument(
+        '-o', '--outfile', default='-',
+        help='the file to write results to, - for stdout (default)'
+    )
+
+    query = commands.add_parser(
+        'query', parents=[source, filtered],
+        help='select fields from the rows matching where clauses'
+    )
+    query.add_argument(
+        '-f', '--fields', nargs='+', required=True,
+        help='the fields to return'
+    )
+    query.add_argument(
+        '--order-by', nargs='+',
+        help='the fields to order by, each optionally followed by ASC or '
+             'DESC (i.e. "dob DESC")'
+    )
+    query.add_argument(
+        '--distinct', action='store_true',
+        help='only write the first of each distinct row'
+    )
+    query.add_argument(
+        '--dedupe-on', nargs='+',
+        help='only write the first row of each distinct set of these fields'
+    )
+    query.add_argument(
+        '--pipeline', action='store_true',
+        help='read, process and write in separate threads, reporting how '
+             'long each stage stalled'
+    )
+    query.set_defaults(func=run_query)
+
+    followed = commands.add_parser(
+        'follow', parents=[source, filtered],
+        help='write the rows appended to a growing file that match where '
+             'clauses as they arrive, until interrupted'
+    )
+    followed.add_argument(
+        '-f', '--fields', nargs='+', required=True,
+        help='the fields to return'
+    )
+    followed.add_argument(
+        '--from-start', action='store_true',
+        help='also query the rows already in the file'
+    )
+    followed.add_argument(
+        '--poll', action='store_true',
+        help='poll the file rather than watching it with inotify'
+    )
+    followed.add_argument(
+        '--poll-interval', type=float, default=tail.DEFAULT_POLL_INTERVAL,
+        help='the shortest wait in seconds between polls'
+    )
+    followed.add_argument(
+        '--max-interval', type=float, default=tail.DEFAULT_MAX_INTERVAL,
+        help='the longest wait in seconds between checks of the file'
+    )
+    followed.set_defaults(func=run_follow)
+
+    group = commands.add_parser(
+        'group', parents=[source, filtered],
+        help='aggregate the rows matching where clauses by fields'
+    )
+    group.add_argument(
+        '-b', '--by', nargs='+', required=True,
+        help='the fields to group by'
+    )
+    group.add_argument(
+        '-a', '--aggregate', nargs='+', default=['count'],
+        help='the aggregates, a function of count, sum, min, max or avg with '
+             'the field in brackets i.e. "avg(age)" (default count)'
+    )
+    group.set_defaults(func=run_group_by)
+
+    joined = commands.add_parser(
+        'join', parents=[source],
+        help='join the rows of the input to another file on a key'
+    )
+    joined.add_argument(
+        '--other', required=True,
+        help='the data file to join to'
+    )
+    joined.add_argument(
+        '--on', nargs='+', required=True,
+        help='the field to join on, or the field in the input then the '
+             'field in the other file'
+    )
+    joined.add_argument(
+        '-f', '--fields', nargs='+', required=True,
+        help='the fields to return, from the input where both have a field'
+    )
+    joined.add_argument(
+        '--how', choices=['inner', 'left'], default='inner',
+        help='inner for rows matching in both (default), left for every row '
+             'of the input'
+    )
+    joined.add_argument(
+        '--other-terminator',
+        help='the terminator of the other file (default the input\'s)'
+    )
+    joined.add_argument(
+        '--other-encloser',
+        help='the encloser of the other file (default the input\'s)'
+    )
+    joined.add_argument(
+        '--memory-limit', type=int, default=spill.DEFAULT_MEMORY_LIMIT,
+        help='the bytes to hold in memory before spilling to disk'
+    )
+    joined.add_argument(
+        '-o', '--outfile', default='-',
+        help='the file to write results to, - for stdout (default)'
+    )
+    joined.set_defaults(func=run_join)
+
+    zones = commands.add_parser(
+        'zonemap', parents=[source],
+        help='build a zone map of a file, which query uses to skip blocks '
+             'of rows that can\'t match'
+    )
+    zones.add_argument(
+        '-f', '--fields', nargs='+', required=True,
+        help='the fields to keep the min and max of per block'
+    )
+    zones.add_argument(
+        '--block-size', type=int, default=zonemap.DEFAULT_BLOCK_SIZE,
+        help='the bytes of rows per block (default 1mb)'
+    )
+    zones.set_defaults(func=run_zone_map)
+
+    stats = commands.add_parser(
+        'stats', aliases=['statistics'], parents=[source],
+        help='count the values of a field, written to stdout as JSON'
+    )
+    stats.add_argument(
+        '--field', required=True,
+        help='the field to calculate statistics for'
+    )
+    stats.add_argument(
+        '--regex', default='.*',
+        help='the pattern to extract from each value (default .*)'
+    )
+    stats.add_argument(
+        '--group-idx', type=int,
+        help='the regex group to take the result from'
+    )
+    stats.add_argument(
+        '--return-type', choices=['#', '%'], default='#',
+        help='# for counts (default), %% for percentages'
+    )
+    stats.add_argument(
+        '--top', type=int,
+        help='how many results to show'
+    )
+    stats.add_argument(
+        '--sample', type=int,
+        help='estimate from a random sample of this many rows'
+    )
+    stats.add_argument(
+        '--confidence', type=float, default=0.95,
+        help='the confidence level of sampled intervals (default 0.95)'
+    )
+    stats.add_argument(
+        '--seed', type=int,
+        help='a seed to make the sample repeatable'
+    )
+    stats.set_defaults(func=run_statistics)
+    return parser
+
+
+def main(argv=None):
+    """Entry point of the datatool command
+
+    :param argv, a list of arguments, defaults to sys.argv
+    :rtype integer exit status
+    """
+    args = build_parser().parse_args(argv)
+    try:
+        args.func(args)
+    except BrokenPipeError:
+        # The reader went away (i.e. piped into head) - stop quietly, and
+        # point stdout at devnull so the interpreter's flush doesn't fail
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (Error, ValueError, AttributeError, TypeError, OSError) as e:
+        print('datatool: {error}'.format(error=e), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import csv
+import datetime
 import io
 from functools import wraps
 from dateutil.parser import parse
@@ -87,6 +88,75 @@ def convert_to_dict(data, terminator, encloser, headers):
     return dictionary
 
 
+def has_encloser(lines, encloser):
+    """Checks whether any of a sample of lines use the encloser
+
+    :param lines, an iterable of strings, the sample of lines
+    :param encloser, used to enclose multiple values in a field
+    :rtype boolean
+    """
+    return any(encloser in line for line in lines)
+
+
+def make_splitter(headers, columns, terminator, encloser, quoted=True):
+    """Creates a function converting a line into a dict of only the columns
+    referenced - projection pushdown for scans that need a few fields
+
+    The quoted splitter tokenises with the csv module, the unquoted one
+    splits on the terminator and stops after the highest referenced column,
+    falling back to the csv module for any line containing the encloser.
+    Only referenced values are stripped and stored, and the unquoted splitter
+    can only check the field count up to the highest referenced column.
+
+    :param headers, a dict of headers and their indexes
+    :param columns, a list of the headers to return
+    :param terminator, a terminator for fields in the string
+    :param encloser, used to enclose multiple values in a field
+    :param quoted, a boolean, False when the data is known (i.e. from a
+    sample) to rarely use the encloser
+    :rtype function taking a string and returning a dict
+    """
+    indexes = [(column, headers[column]) for column in columns]
+    field_count = len(headers)
+    last = max([idx for _, idx in indexes], default=-1)
+    # a well formed line splits into the referenced columns plus the rest
+    expected = min(last + 2, field_count)
+
+    def mismatch(values):
+        return ValueError(
+            (
+                "Headers : {headers}, of size {header_count}, "
+                "Values: {values}, of size {value_count}, "
+                "The sizes must match."
+            ).format(
+                headers=headers,
+                values=values,
+                header_count=field_count,
+                value_count=len(values)
+            )
+        )
+
+    def split_quoted(line):
+        values = next(csv.reader(
+            [line],
+            delimiter=terminator,
+            quotechar=encloser
+        ), [])
+        if len(values) != field_count:
+            raise mismatch(values)
+        return {column: values[idx].strip() for column, idx in indexes}
+
+    def split_unquoted(line):
+        if encloser in line:
+            return split_quoted(line)
+        values = line.split(terminator, last + 1)
+        if len(values) != expected:
+            raise mismatch(values)
+        return {column: values[idx].strip() for column, idx in indexes}
+
+    return split_quoted if quoted else split_unquoted
+
+
 @get_data_format_rules
 def convert_to_string(data, terminator, encloser, headers):
     """Converts dict to a string
@@ -116,13 +186,105 @@ def convert_to_types(converted_dict):
     """
     type_dict = {}
     for key, value in converted_dict.items():
+        # numbers first - dateutil will happily read "30" as a day
         try:
-            parse(value)
-            type_dict[key] = 'date'
+            float(value)
+            type_dict[key] = 'numeric'
         except ValueError as ve:
             try:
-                float(value)
-                type_dict[key] = 'numeric'
-            except ValueError as ve:
+                parse(value)
+                type_dict[key] = 'date'
+            except (ValueError, OverflowError) as ve:
                 type_dict[key] = 'string'
     return type_dict
+
+
+def infer_types(rows):
+    """Infers the type of each field from a sample of rows, a field is only
+    numeric or date when every non empty value in the sample agrees
+
+    :param rows, an iterable of dictionaries of headers and values
+    :rtype dictionary of headers and types
+    """
+    seen = {}
+    for row in rows:
+        non_empty = {key: value for key, value in row.items() if value != ''}
+        for key, data_type in convert_to_types(non_empty).items():
+            seen.setdefault(key, set()).add(data_type)
+        for key in row:
+            seen.setdefault(key, set())
+    return {
+        key: types.pop() if len(types) == 1 else 'string'
+        for key, types in seen.items()
+    }
+
+
+def convert_to_typed(value, data_type):
+    """Converts a value to its type for comparisons, values that don't
+    convert order after those that do, i.e. (0, 1.5) < (1, 'n/a')
+
+    :param value, a string (or a datetime already parsed by a query)
+    :param data_type, a string, one of numeric, date or string
+    :rtype tuple of a rank and the typed value
+    """
+    try:
+        if data_type == 'numeric':
+            return (0, float(value))
+        elif data_type == 'date':
+            if isinstance(value, datetime.datetime):
+                return (0, value)
+            return (0, parse(value))
+    except (ValueError, OverflowError, TypeError):
+        return (1, str(value))
+    return (0, value)
+
+
+def convert_to_range(values):
+    """Converts the low and high values of a range to a common type, numeric
+    if both are numbers, otherwise dates if both are dates, else strings
+
+    :param values, a list or tuple of two values
+    :rtype tuple of the low and high value
+    """
+    low, high = values
+    for convert in (float, parse):
+        try:
+            return (convert(low), convert(high))
+        except (ValueError, OverflowError, TypeError):
+            pass
+    return (str(low), str(high))
+
+
+def convert_to_set(values, encloser='"'):
+    """Converts the value list of a membership condition to a frozenset of
+    the text values rows are compared as, so a lookup costs the same however
+    many values there are
+
+    :param values, a list of values, or a path to a file of one value per
+    line (wrapping enclosers are removed, empty lines skipped)
+    :param encloser, the string values in the file may be enclosed in
+    :rtype frozenset of strings
+    """
+    if isinstance(values, str):
+        with open(values, 'r') as f:
+            return frozenset(
+                value for value in (
+                    line.strip().strip(encloser).strip() for line in f
+                ) if value
+            )
+    return frozenset(str(value).strip() for value in values)
+
+
+def convert_like(value, example):
+    """Converts a string value to the type of an example value, as made by
+    convert_to_range
+
+    :param value, a string
+    :param example, a float, datetime or string
+    :rtype float, datetime or string
+    """
+    if isinstance(example, float):
+        return float(value)
+    elif isinstance(example, datetime.datetime):
+        return parse(value)
+    return value
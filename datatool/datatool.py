@@ -1,12 +1,18 @@
 import os
-import re
-from . import converter
+import random
+from contextlib import contextmanager
+from itertools import chain
+from operator import itemgetter
+from . import aggregate, backend, converter, extractor, join, sampling, spill
+from . import pipeline as stages, zonemap
+from . import distinct as dedupe, follow as tail
 from .config.exceptions import ConditionTypeError, FieldHeaderError
 from dateutil.parser import parse
 
 
 class DataTool():
     headers = {}
+    SAMPLE_SIZE = 100
     CONDITIONS = {
         'CONTAINS':
             lambda value, match_value:
@@ -28,10 +34,16 @@ class DataTool():
                 value > match_value,
         'BETWEEN':
             lambda value, match_value:
-                True,
+                match_value[0] <= value <= match_value[1],
         'NOT':
             lambda value, match_value:
-                value != match_value
+                value != match_value,
+        'IN':
+            lambda value, match_value:
+                value in match_value,
+        'NOT_IN':
+            lambda value, match_value:
+                value not in match_value
     }
 
     def __init__(self, **kwargs):
@@ -40,27 +52,163 @@ class DataTool():
             and an encloser for multiple values
 
         :param filename, a path to a valid existing read File
+        :param stream, an open text stream (i.e. sys.stdin) to read instead
+        of a filename, it can only be scanned once
         :param terminator, the string used to terminate fields in the File
         :param encloser, the string to enclose multiple values in a single
         field
+        :param database, optionally a path to an SQLite database made by
+        to_sqlite, query and statistics then run against it
+        :raises ValueError, when the database wasn't loaded by to_sqlite from
+        a file with the same headers
         """
-        try:
-            self.filename = kwargs.get('filename')
-        except:
-            raise AttributeError('Filename kwarg must be provided')
-        if not os.path.exists(self.filename):
-            raise AttributeError('File must exist')
+        self.stream = kwargs.get('stream')
+        self.__stream_consumed = False
+        database = kwargs.get('database')
+        self.backend = backend.SQLiteBackend(database) if database else None
         self.terminator = kwargs.get('terminator', ',')
         self.encloser = kwargs.get('encloser', '\"')
-        with open(self.filename, 'r') as f:
-            header_string = f.readline().strip()
+        if self.stream is not None:
+            self.filename = getattr(self.stream, 'name', '<stream>')
+            header_string = self.stream.readline().strip()
+        else:
+            try:
+                self.filename = kwargs.get('filename')
+            except:
+                raise AttributeError('Filename kwarg must be provided')
+            if not os.path.exists(self.filename):
+                raise AttributeError('File must exist')
+            with open(self.filename, 'r') as f:
+                header_string = f.readline().strip()
         self.headers = converter.get_indexes(
             data=header_string,
             terminator=self.terminator,
             encloser=self.encloser
         )
+        if self.backend is not None and self.backend.headers != sorted(
+            self.headers, key=self.headers.get
+        ):
+            self.backend.close()
+            raise ValueError(
+                'database {database} holds the headers {loaded}, not those '
+                'of {filename}'.format(
+                    database=database,
+                    loaded=', '.join(self.backend.headers),
+                    filename=self.filename
+                )
+            )
+
+    @contextmanager
+    def __open_source(self):
+        """[PRIVATE] Opens the data source positioned after the header line
+
+        A stream source is handed back as is (its header was consumed during
+        instantiation) and may only be scanned once
 
-    def statistics(self, field, search, return_type, top):
+        :rtype file object
+        """
+        if self.stream is not None:
+            if self.__stream_consumed:
+                raise ValueError('A stream source can only be scanned once')
+            self.__stream_consumed = True
+            yield self.stream
+        else:
+            with open(self.filename, 'r') as f:
+                f.readline()
+                yield f
+
+    def __source_size(self):
+        """[PRIVATE] The size in bytes of a file source, None for a stream
+
+        :rtype integer
+        """
+        if self.stream is not None:
+            return None
+        return os.path.getsize(self.filename)
+
+    @staticmethod
+    def __lines(f):
+        """[PRIVATE] Iterates the lines of an open source, line by line
+
+        Reading through readline hands each line on as soon as it arrives,
+        so a pipe upstream is never waited on for a whole read-ahead block
+
+        :param f, an open file object
+        :rtype generator of strings
+        """
+        return iter(f.readline, '')
+
+    @contextmanager
+    def __open_sink(self, outfile):
+        """[PRIVATE] Opens the query output, either a path or a writable
+        stream (i.e. sys.stdout), streams are not closed on exit
+
+        :param outfile, a path or an object with a write method
+        :rtype file object
+        """
+        if hasattr(outfile, 'write'):
+            yield outfile
+        else:
+            with open(outfile, 'w') as wf:
+                yield wf
+
+    def __sample(self, size=None):
+        """[PRIVATE] Reads the first lines after the header of a file source,
+        a stream source can't be rewound so gives an empty sample
+
+        :param size, an integer, how many lines to read
+        :rtype list of strings
+        """
+        if self.stream is not None:
+            return []
+        size = size or self.SAMPLE_SIZE
+        with open(self.filename, 'r') as f:
+            f.readline()
+            return [line for _, line in zip(range(size), self.__lines(f))]
+
+    def __splitter(self, columns):
+        """[PRIVATE] Creates the line splitter for a scan referencing columns,
+        choosing the unquoted fast path when a sample has no enclosers
+
+        :param columns, a list of the headers the scan references
+        :rtype function taking a string and returning a dict
+        """
+        return converter.make_splitter(
+            headers=self.headers,
+            columns=list(dict.fromkeys(columns)),
+            terminator=self.terminator,
+            encloser=self.encloser,
+            quoted=converter.has_encloser(self.__sample(), self.encloser)
+        )
+
+    def __sample_lines(self, size, seed=None):
+        """[PRIVATE] Picks a random sample of lines, by seeking to random
+        byte offsets of a file source or by reservoir sampling a stream (or
+        a file with about as few rows as the sample)
+
+        :param size, an integer, how many lines to sample
+        :param seed, optionally a seed for the random number generator
+        :rtype tuple of the lines, the rows in the source (estimated from
+        their mean length when seeking), the method and whether every row
+        of the source was read
+        """
+        rng = random.Random(seed)
+        estimate = self.__estimate_rows()
+        if estimate is None or estimate <= size:
+            with self.__open_source() as f:
+                lines, total = sampling.reservoir(self.__lines(f), size, rng)
+            return lines, total, 'reservoir', True
+        with open(self.filename, 'rb') as f:
+            f.readline()
+            start = f.tell()
+            end = f.seek(0, os.SEEK_END)
+            lines, length = sampling.seek_lines(f, start, end, size, rng)
+        return lines, int(round((end - start) / length)), 'seek', False
+
+    def statistics(self, field, search, return_type, top,
+                   cache_size=extractor.DEFAULT_CACHE_SIZE, cache_info=False,
+                   sample=None, confidence=sampling.DEFAULT_CONFIDENCE,
+                   seed=None):
         """ Calculates statistics for the data file provided during
         instantiation
 
@@ -74,42 +222,63 @@ class DataTool():
         :param result, a character to determine how to calculate the result,
         currently either %  for percent, or # for numeric
         :param top, an integer, how many results to show, group the others
+        :param cache_size, an integer, how many distinct values to remember
+        the extracted result of
+        :param cache_info, a boolean, True adds a cache key reporting the
+        search strategy and the cache hits, misses and hit rate
+        :param sample, an integer, estimate the results from a random sample
+        of this many rows rather than reading them all, adding a sample key
+        with the rows sampled and an intervals key of each result's
+        confidence interval (ignored with a database, which counts exactly)
+        :param confidence, a float, the confidence level of the intervals
+        :param seed, optionally a seed to make the sample repeatable
         :rtype dictionary
         """
         stats = {'data': {}}
-        try:
-            regex = re.compile(search['regex'])
-        except:
-            raise TypeError('Regex must be supplied as a string / pattern')
-        with open(self.filename, 'r') as f:
-            f.readline()
-            for row_number, line in enumerate(f):
-                row = converter.convert_to_dict(
-                    data=line,
-                    terminator=self.terminator,
-                    encloser=self.encloser,
-                    headers=self.headers
+        if field not in self.headers:
+            raise FieldHeaderError(field, self.headers.keys())
+        extract = extractor.compile_search(search, cache_size)
+        counts = stats['data']
+        row_number = -1
+        if self.backend is not None:
+            # Each distinct value is extracted once and weighted by its count
+            total, value_counts = self.backend.value_counts(field)
+            row_number = total - 1
+            for value, count in value_counts:
+                result = extract(value)
+                if result is not None:
+                    counts[result] = counts.get(result, 0) + count
+        elif sample:
+            split = self.__splitter([field])
+            lines, total, method, exact = self.__sample_lines(sample, seed)
+            for row_number, line in enumerate(lines):
+                result = extract(split(line)[field])
+                if result is not None:
+                    counts[result] = counts.get(result, 0) + 1
+            rows = row_number + 1
+            scale = 100 if return_type == '%' else total
+            intervals = {}
+            for result, hits in counts.items():
+                low, high = sampling.wilson_interval(
+                    hits, rows, confidence, total if exact else None
                 )
-                try:
-                    value = row[field]
-                except:
-                    raise FieldHeaderError(field, row.keys())
-                # rewrite this......
-                regex_result = regex.search(value)
-                if regex_result is not None:
-                    if (
-                        'group_idx' in search.keys() and
-                        regex_result.groups() is not None
-                    ):
-                        result = regex_result.groups()[search['group_idx']]
-                    elif regex_result.group() is not None:
-                        result = regex_result.group()
-                    else:
-                        result = None
+                intervals[result] = [low * scale, high * scale]
+                if return_type != '%':
+                    counts[result] = int(round(hits / rows * total))
+            stats['intervals'] = intervals
+            stats['sample'] = {
+                'rows': rows,
+                'estimated_rows': total,
+                'method': method,
+                'confidence': confidence
+            }
+        else:
+            split = self.__splitter([field])
+            with self.__open_source() as f:
+                for row_number, line in enumerate(self.__lines(f)):
+                    result = extract(split(line)[field])
                     if result is not None:
-                        stats['data'][result] = stats['data'].get(
-                            result, 0
-                        ) + 1
+                        counts[result] = counts.get(result, 0) + 1
 
         if return_type == '%':
             stats['data'].update(
@@ -118,6 +287,8 @@ class DataTool():
                     for k, v in stats['data'].items()
                 }
             )
+        if cache_info:
+            stats['cache'] = extractor.cache_report(extract)
         return stats
 
     def __process_query(self, row, queries, func=all):
@@ -140,10 +311,20 @@ class DataTool():
         for query in queries:
             condition = query.get('condition')
             field = query.get('field')
-            if condition in ('BEFORE', 'AFTER'):
-                row[field] = parse(row[field])  # bottle neck
+            value = row[field]
+            try:
+                if condition in ('BEFORE', 'AFTER'):
+                    value = row[field] = parse(value)  # bottle neck
+                elif condition in ('GREATER', 'LESS'):
+                    value = float(value)
+                elif condition == 'BETWEEN':
+                    value = converter.convert_like(value, query['value'][0])
+            except (ValueError, OverflowError):
+                # i.e. an empty value can't be before or greater than anything
+                query_results_append(False)
+                continue
             query_results_append(
-                self.CONDITIONS[condition](row[field], query.get('value'))
+                self.CONDITIONS[condition](value, query.get('value'))
             )
         return func(query_results)
 
@@ -170,18 +351,48 @@ class DataTool():
                 )
             )
         elif (
-            condition in ('GREATER', 'LESS') and
-            data_types.get(field) != 'numeric'
+            condition in ('GREATER', 'LESS') and (
+                data_types.get(field, 'numeric') != 'numeric' or
+                not isinstance(query.get('value'), (int, float))
+            )
         ):
             raise ConditionTypeError('numeric', ['GREATER', 'LESS'])
         elif (
             condition in ('BEFORE', 'AFTER') and
-            data_types.get(field) != 'date'
+            data_types.get(field, 'date') != 'date'
         ):
             raise ConditionTypeError('datetime', ['BEFORE', 'AFTER'])
+        elif (
+            condition == 'BETWEEN' and (
+                not isinstance(query.get('value'), tuple) or
+                len(query.get('value')) != 2
+            )
+        ):
+            raise ConditionTypeError('a list of two values', ['BETWEEN'])
+        elif (
+            condition in ('IN', 'NOT_IN') and
+            not isinstance(query.get('value'), frozenset)
+        ):
+            raise ConditionTypeError(
+                'a list of values or a path to a file of them',
+                ['IN', 'NOT_IN']
+            )
         else:
             return True
 
+    @staticmethod
+    def __row_types(row):
+        """[PRIVATE] The types of the values of a row, which where clauses
+        are validated against
+
+        :param row, a dictionary of headers and values
+        :rtype dictionary of headers and types
+        """
+        # An empty value says nothing of its field's type, so isn't checked
+        return converter.convert_to_types(
+            {field: value for field, value in row.items() if value != ''}
+        )
+
     def __process_line(self, row, where, func):
         """[PRIVATE]Initially called by the query method - generates data types
         and validates the where queries before handing off via self assignment
@@ -195,70 +406,660 @@ class DataTool():
 
         :rtype boolean
         """
-        data_types = converter.convert_to_types(row)
+        data_types = self.__row_types(row)
         for query in where:
             self.__validate_query(data_types, query)
         self.__process_line = self.__process_query
         return self.__process_query(row, where, func)
 
-    def query(self, fields, where, match_all, outfile):
-        """Executes a query on the datafile tied to the object, and creates a
-        new file of the output
+    def __prepare_where(self, where):
+        """[PRIVATE] Normalises the where clauses of a query, upper casing
+        conditions and converting values for typed conditions, and validates
+        the queried fields exist
 
-        :param fields, a list of fields to return from the source data file
         :param where, a list of dictionaries (or single dict), of clauses
-        :param match_all, a boolean, True will match if the row meets all the
-        clauses in the where
-        :param outfile, the path to, and name to write the outfile to
-
-        :rtype dictionary of filename and records affected
+        :rtype tuple of the list of clauses and the list of queried fields
         """
-
         if isinstance(where, dict):
             where = [where]
-        valid_return_fields = set(fields).issubset(set(self.headers.keys()))
         query_fields = []
         for query in where:
             query['condition'] = query.get('condition').upper()
             try:
-                query['value'] = parse(query.get('value'))
+                if query['condition'] in ('BEFORE', 'AFTER'):
+                    query['value'] = parse(query.get('value'))
+                elif query['condition'] in ('GREATER', 'LESS'):
+                    query['value'] = float(query.get('value'))
+                elif query['condition'] == 'BETWEEN':
+                    query['value'] = converter.convert_to_range(
+                        query.get('value')
+                    )
             except:
                 pass
+            if (
+                query['condition'] in ('CONTAINS', 'EQUALS', 'NOT') and
+                query.get('value') is not None
+            ):
+                # Rows are compared as text, so a number (i.e. from JSON)
+                # is matched as the text it's written as
+                query['value'] = str(query['value'])
+            if (
+                query['condition'] in ('IN', 'NOT_IN') and
+                isinstance(query.get('value'), (str, list, tuple, set))
+            ):
+                # Outside the try, a missing file of values is an error
+                query['value'] = converter.convert_to_set(
+                    query['value'], self.encloser
+                )
             query_fields.append(query.get('field'))
         valid_query_fields = set(query_fields).issubset(
             set(self.headers.keys())
         )
+        if not valid_query_fields:
+            raise FieldHeaderError(query_fields, self.headers.keys())
+        return where, query_fields
+
+    def __parse_order_by(self, order_by):
+        """[PRIVATE] Normalises an order by into a list of fields and
+        directions, validating the fields exist
+
+        :param order_by, a field, or list of fields, each either a string of
+        the field optionally followed by ASC or DESC (i.e. 'dob DESC') or a
+        dictionary with field and order keys
+        :rtype list of tuples of field and boolean, True for descending
+        """
+        if isinstance(order_by, (str, dict)):
+            order_by = [order_by]
+        order = []
+        for key in order_by:
+            if isinstance(key, dict):
+                field = key.get('field')
+                direction = key.get('order', 'ASC')
+            else:
+                field, _, direction = key.strip().rpartition(' ')
+                if direction.upper() not in ('ASC', 'DESC'):
+                    field, direction = key.strip(), 'ASC'
+            if direction.upper() not in ('ASC', 'DESC'):
+                raise ValueError('order must be one of ASC, DESC')
+            order.append((field.strip(), direction.upper() == 'DESC'))
+        order_fields = [field for field, _ in order]
+        if not set(order_fields).issubset(set(self.headers.keys())):
+            raise FieldHeaderError(order_fields, self.headers.keys())
+        return order
+
+    def __matches(self, rf, split, where, func, flow=None):
+        """[PRIVATE] Iterates the rows of an open source matching the where
+
+        :param rf, an open file object positioned after the header
+        :param split, a function converting a line into a row dictionary
+        :param where, a list of queries to perform on the row
+        :param func, a function, the any or all function - OR / AND bool logic
+        :param flow, optionally a Pipeline to read the source through
+        :rtype generator of row dictionaries
+        """
+        for line in self.__source_lines(rf, where, func, flow):
+            row = split(line)
+            if self.__process_line(row, where, func):
+                yield row
+
+    def __source_lines(self, rf, where, func, flow=None):
+        """[PRIVATE] The lines of a scan, skipping the blocks a fresh zone
+        map of the file shows can't match the where
+
+        :param rf, an open file object positioned after the header
+        :param where, a list of prepared where clauses
+        :param func, a function, the any or all function - OR / AND bool logic
+        :param flow, optionally a Pipeline to read the lines in a reader
+        thread, in large blocks when the whole source is read
+        :rtype iterator of strings
+        """
+        lines = None
+        path = zonemap.sidecar_path(self.filename)
+        if self.stream is None and where and os.path.exists(path):
+            zones = zonemap.ZoneMap.load(path)
+            if zones.fresh(self.filename):
+                blocks = zones.candidate_blocks(where, func is all)
+                if len(blocks) < len(zones.blocks):
+                    lines = zones.lines(self.filename, blocks)
+        if flow is not None:
+            return flow.read(rf if lines is None else lines)
+        return self.__lines(rf) if lines is None else lines
+
+    def __infer_types(self, split, fields):
+        """[PRIVATE] Infers the types of fields from a sample of the source,
+        a stream source can't be sampled so gives an empty dictionary
+
+        :param split, the function used to convert lines into rows
+        :param fields, a list of the fields to infer
+        :rtype dictionary of fields and types
+        """
+        return converter.infer_types(
+            {field: str(row[field]) for field in fields}
+            for row in map(split, self.__sample())
+        )
+
+    @staticmethod
+    def __first_row_types(rows, types, fields):
+        """[PRIVATE] Infers the types of fields from the first row when there
+        was no sample to infer them from (i.e. a stream source)
+
+        :param rows, an iterator of row dictionaries
+        :param types, a dictionary of fields and types, possibly empty
+        :param fields, a list of the fields to infer
+        :rtype tuple of the rows (including the first) and the types
+        """
+        if types or not fields:
+            return rows, types
+        first = next(rows, None)
+        if first is None:
+            return rows, types
+        types = converter.infer_types(
+            [{field: str(first[field]) for field in fields}]
+        )
+        return chain([first], rows), types
+
+    def __sort_rows(self, rows, order, types, fields, memory_limit):
+        """[PRIVATE] Orders matched rows with an external merge sort, each
+        order field compared by the type inferred for it
+
+        :param rows, an iterable of row dictionaries
+        :param order, a list of tuples of field and descending
+        :param types, a dictionary of the order fields and their types, when
+        empty the types are inferred from the first row
+        :param fields, the fields written for each row
+        :param memory_limit, an integer of bytes to sort in memory per run
+        :rtype generator of output lines in order
+        """
+        order_fields = [field for field, _ in order]
+        rows, types = self.__first_row_types(rows, types, order_fields)
+        descending = tuple(descending for _, descending in order)
+        if len(set(descending)) > 1:
+            def key(record):
+                return spill.OrderKey(record[0], descending)
+            reverse = False
+        else:
+            key = itemgetter(0)
+            reverse = any(descending)
+
+        records = (
+            (
+                tuple(
+                    converter.convert_to_typed(
+                        row[field], types.get(field, 'string')
+                    ) for field in order_fields
+                ),
+                self.__format_row(row, fields)
+            ) for row in rows
+        )
+        for _, line in spill.external_sort(
+            records, key=key, reverse=reverse, memory_limit=memory_limit
+        ):
+            yield line
+
+    @staticmethod
+    def __format_row(row, fields):
+        """[PRIVATE] Formats the fields of a row as an output line
+
+        :param row, a dictionary of headers and values
+        :param fields, a list of the fields to write
+        :rtype string
+        """
+        result = {field: row[field] for field in fields}
+        return converter.convert_to_string(
+            data=result,
+            terminator=',',
+            encloser='\"',
+            headers=[]
+        )
+
+    def __estimate_rows(self):
+        """[PRIVATE] Estimates the rows of a file source from its size and
+        the line lengths of a sample, None for a stream
+
+        :rtype integer
+        """
+        sample = self.__sample()
+        if not sample:
+            return None
+        line_length = sum(len(line) for line in sample) / len(sample)
+        return int(self.__source_size() / line_length)
+
+    def query(self, fields, where, match_all, outfile, order_by=None,
+              memory_limit=spill.DEFAULT_MEMORY_LIMIT, distinct=False,
+              dedupe_on=None, pipeline=False):
+        """Executes a query on the datafile tied to the object, and creates a
+        new file of the output
+
+        :param fields, a list of fields to return from the source data file
+        :param where, a list of dictionaries (or single dict), of clauses
+        :param match_all, a boolean, True will match if the row meets all the
+        clauses in the where
+        :param outfile, the path to, and name to write the outfile to, or a
+        writable stream (i.e. sys.stdout)
+        :param order_by, a field or list of fields to order the output by,
+        each optionally followed by ASC or DESC (i.e. ['location', 'dob DESC'])
+        values are compared by the type inferred for the field
+        :param memory_limit, an integer of bytes, how much of the output to
+        sort in memory before spilling sorted runs to temporary files, and
+        the keys to hold while checking duplicates
+        :param distinct, a boolean, True only writes the first of each
+        distinct row of the fields
+        :param dedupe_on, a list of fields, only writes the first row of each
+        distinct set of values of these fields
+        Duplicates are found with a Bloom filter, with possible duplicates
+        checked exactly from partitioned temporary files at the end - so
+        rows the filter flagged are written after the others
+        :param pipeline, a boolean, True reads the source in large blocks in
+        a reader thread and writes in large batches in a writer thread,
+        overlapping the I/O with parsing and matching, and adds a pipeline
+        key of the seconds each stage stalled waiting on the others
+
+        :rtype dictionary of filename and records affected
+        """
+
+        valid_return_fields = set(fields).issubset(set(self.headers.keys()))
         if not valid_return_fields:
             raise FieldHeaderError(fields, self.headers.keys())
-        elif not valid_query_fields:
-            raise FieldHeaderError(query_fields, self.headers.keys())
         else:
-            query_result = {'data': {'filename': outfile, 'records': 0}}
+            where, query_fields = self.__prepare_where(where)
+            order = self.__parse_order_by(order_by) if order_by else []
+            if isinstance(dedupe_on, str):
+                dedupe_on = [dedupe_on]
+            elif dedupe_on is None and distinct:
+                dedupe_on = fields
+            if dedupe_on and not set(dedupe_on).issubset(
+                set(self.headers.keys())
+            ):
+                raise FieldHeaderError(dedupe_on, self.headers.keys())
+            query_result = {
+                'data': {
+                    'filename': getattr(outfile, 'name', outfile),
+                    'records': 0
+                }
+            }
             if match_all:
                 func = all
             else:
                 func = any
-            with open(self.filename, 'r') as rf:
-                with open(outfile, 'w') as wf:
-                    wf.write(', '.join(fields) + '\n')
-                    rf.readline()
-                    for line in rf:
-                        row = converter.convert_to_dict(
-                            data=line,
-                            terminator=self.terminator,
-                            encloser=self.encloser,
-                            headers=self.headers
-                        )
-                        if self.__process_line(row, where, func):
-                            result = {}
-                            result = {field: row[field] for field in fields}
-                            query_result['data']['records'] += 1
-                            write_line = converter.convert_to_string(
-                                data=result,
-                                terminator=',',
-                                encloser='\"',
-                                headers=[]
-                            )
-                            wf.write(write_line + '\n')
+            flow = stages.Pipeline() if pipeline else None
+            if self.backend is not None:
+                lines = self.__backend_lines(
+                    fields, where, match_all, order, dedupe_on
+                )
+            else:
+                lines = self.__scan_lines(
+                    fields, where, query_fields, func, order, dedupe_on,
+                    memory_limit, flow
+                )
+            with self.__open_sink(outfile) as wf:
+                wf.write(', '.join(fields) + '\n')
+                if flow is not None:
+                    query_result['data']['records'] = flow.write(
+                        wf, (write_line + '\n' for write_line in lines)
+                    )
+                    query_result['pipeline'] = flow.report()
+                else:
+                    for write_line in lines:
+                        query_result['data']['records'] += 1
+                        wf.write(write_line + '\n')
 
             return query_result
+
+    def __scan_lines(self, fields, where, query_fields, func, order,
+                     dedupe_on, memory_limit, flow=None):
+        """[PRIVATE] Scans the source for the output lines of a query
+
+        :param fields, a list of fields to return
+        :param where, a list of prepared where clauses
+        :param query_fields, a list of the fields of the where clauses
+        :param func, a function, the any or all function - OR / AND bool logic
+        :param order, a list of tuples of field and descending
+        :param dedupe_on, a list of fields to drop duplicate rows of
+        :param memory_limit, an integer of bytes to sort or dedupe in memory
+        :param flow, optionally a Pipeline to read the source through
+        :rtype generator of output lines
+        """
+        # Only the selected, queried, ordered and deduped columns are parsed
+        order_fields = [field for field, _ in order]
+        split = self.__splitter(
+            fields + query_fields + order_fields + (dedupe_on or [])
+        )
+        types = self.__infer_types(split, order_fields) if order else {}
+        capacity = self.__estimate_rows() if dedupe_on else None
+        with self.__open_source() as rf:
+            rows = self.__matches(rf, split, where, func, flow)
+            if dedupe_on:
+                rows = dedupe.distinct(
+                    rows,
+                    key=lambda row: tuple(row[field] for field in dedupe_on),
+                    capacity=capacity or dedupe.DEFAULT_CAPACITY,
+                    memory_limit=memory_limit
+                )
+            if order:
+                yield from self.__sort_rows(
+                    rows, order, types, fields, memory_limit
+                )
+            else:
+                for row in rows:
+                    yield self.__format_row(row, fields)
+
+    def __backend_lines(self, fields, where, match_all, order, dedupe_on):
+        """[PRIVATE] Runs a query against the SQLite backend for its output
+        lines, validating the where against the first row as a scan does
+
+        :param fields, a list of fields to return
+        :param where, a list of prepared where clauses
+        :param match_all, a boolean, True ANDs the clauses, False ORs them
+        :param order, a list of tuples of field and descending
+        :param dedupe_on, a list of fields to drop duplicate rows of
+        :rtype generator of output lines
+        """
+        first = self.backend.first_row()
+        if first is not None:
+            data_types = self.__row_types(first)
+            for query in where:
+                self.__validate_query(data_types, query)
+        rows = self.backend.select(fields, where, match_all, order, dedupe_on)
+        for row in rows:
+            yield self.__format_row(row, fields)
+
+    def follow(self, fields, where, match_all, outfile, from_start=False,
+               stop=None, poll_interval=tail.DEFAULT_POLL_INTERVAL,
+               max_interval=tail.DEFAULT_MAX_INTERVAL, inotify=True):
+        """Follows a growing data file like tail -F, writing the rows
+        appended to it that match the where as they arrive - each match is
+        flushed straight away. The where is prepared once and the file is
+        never rescanned, it's watched with inotify where available (else
+        polled, backing off while it's idle) and truncation and rotation are
+        followed to the new data
+
+        :param fields, a list of fields to return from the source data file
+        :param where, a list of dictionaries (or single dict), of clauses
+        :param match_all, a boolean, True will match if the row meets all the
+        clauses in the where
+        :param outfile, the path to, and name to write the outfile to, or a
+        writable stream (i.e. sys.stdout)
+        :param from_start, a boolean, True also queries the rows already in
+        the file, otherwise only rows appended from now on
+        :param stop, optionally a threading.Event, following ends once set -
+        otherwise it runs until interrupted
+        :param poll_interval, a float, the shortest wait in seconds between
+        checks when polling
+        :param max_interval, a float, the longest wait in seconds between
+        checks of the file
+        :param inotify, a boolean, False always polls
+
+        :rtype dictionary of filename and records affected
+        """
+        if self.stream is not None:
+            raise ValueError(
+                'A stream source can not be followed, query streams it'
+            )
+        if not set(fields).issubset(set(self.headers.keys())):
+            raise FieldHeaderError(fields, self.headers.keys())
+        where, query_fields = self.__prepare_where(where)
+        func = all if match_all else any
+        split = self.__splitter(fields + query_fields)
+        lines = tail.follow_lines(
+            self.filename,
+            from_start=from_start,
+            stop=stop,
+            watcher=tail.make_watcher(
+                self.filename, poll_interval, max_interval, inotify
+            )
+        )
+        query_result = {
+            'data': {
+                'filename': getattr(outfile, 'name', outfile),
+                'records': 0
+            }
+        }
+        with self.__open_sink(outfile) as wf:
+            wf.write(', '.join(fields) + '\n')
+            wf.flush()
+            for line in lines:
+                row = split(line)
+                if self.__process_line(row, where, func):
+                    wf.write(self.__format_row(row, fields) + '\n')
+                    wf.flush()
+                    query_result['data']['records'] += 1
+        return query_result
+
+    def group_by(self, fields, aggregates, where=None, match_all=True,
+                 outfile=None, memory_limit=spill.DEFAULT_MEMORY_LIMIT):
+        """Groups the rows matching the where by one or more fields and
+        aggregates other fields per group. Groups are held in a hash table,
+        and spilled to disk in partitions when it outgrows the memory limit
+
+        :param fields, a field or list of fields to group by
+        :param aggregates, a list of dictionaries with function (one of
+        count, sum, min, max or avg) and field keys e.g.
+        [
+            {'function': 'count'},
+            {'function': 'avg', 'field': 'age'}
+        ]
+        count without a field counts rows, sum and avg skip values that
+        aren't numeric, min and max compare by the type inferred for the field
+        :param where, a list of dictionaries (or single dict), of clauses
+        :param match_all, a boolean, True will match if the row meets all the
+        clauses in the where
+        :param outfile, optionally a path or writable stream to write the
+        groups to rather than returning them
+        :param memory_limit, an integer of bytes to hold groups in memory
+
+        :rtype dictionary, of groups (the value, or a tuple of values when
+        grouping by several fields) and their aggregates, or of the filename
+        and records written when given an outfile
+        """
+        if isinstance(fields, str):
+            fields = [fields]
+        if not set(fields).issubset(set(self.headers.keys())):
+            raise FieldHeaderError(fields, self.headers.keys())
+        where, query_fields = self.__prepare_where(where or [])
+        aggregate_fields = [
+            clause.get('field') for clause in aggregates
+            if clause.get('field') is not None
+        ]
+        if not set(aggregate_fields).issubset(set(self.headers.keys())):
+            raise FieldHeaderError(aggregate_fields, self.headers.keys())
+        func = all if match_all else any
+        split = self.__splitter(fields + query_fields + aggregate_fields)
+        types = self.__infer_types(split, aggregate_fields)
+        if len(fields) == 1:
+            key = itemgetter(fields[0])
+        else:
+            def key(row):
+                return tuple(row[field] for field in fields)
+
+        with self.__open_source() as rf:
+            rows, types = self.__first_row_types(
+                self.__matches(rf, split, where, func), types, aggregate_fields
+            )
+            aggregator = aggregate.Aggregator(aggregates, types)
+            groups = aggregate.hash_aggregate(
+                rows, key, aggregator, memory_limit=memory_limit
+            )
+            if outfile is None:
+                return {'data': dict(groups)}
+            result = {
+                'data': {
+                    'filename': getattr(outfile, 'name', outfile),
+                    'records': 0
+                }
+            }
+            with self.__open_sink(outfile) as wf:
+                wf.write(', '.join(fields + aggregator.names) + '\n')
+                for group, values in groups:
+                    if len(fields) == 1:
+                        group = (group, )
+                    row = dict(zip(fields, group))
+                    row.update(values)
+                    wf.write(
+                        self.__format_row(row, fields + aggregator.names) +
+                        '\n'
+                    )
+                    result['data']['records'] += 1
+            return result
+
+    def __keyed_rows(self, key_field, fields):
+        """[PRIVATE] Iterates the rows of the source as a join key and a
+        tuple of the values of fields, an empty key is None (never joined)
+
+        :param key_field, the field to key the rows on
+        :param fields, a list of the fields to keep from each row
+        :rtype generator of tuples of key and tuple of values
+        """
+        split = self.__splitter([key_field] + fields)
+        with self.__open_source() as f:
+            for line in self.__lines(f):
+                row = split(line)
+                yield (
+                    row[key_field] or None,
+                    tuple(row[field] for field in fields)
+                )
+
+    def join(self, other, on, fields, how='inner', outfile=None,
+             memory_limit=spill.DEFAULT_MEMORY_LIMIT):
+        """Joins the rows of this data file with another on equal key values,
+        and writes the fields of the joined rows to a new file. The smaller
+        file is built into a hash table and the larger streamed against it,
+        when the build side outgrows the memory limit both are partitioned
+        to disk and joined a partition at a time
+
+        :param other, a DataTool, the right side of the join
+        :param on, the field to join on, or a tuple of the field in this file
+        and the field in the other
+        :param fields, a list of the fields to return, taken from this file
+        when both have the field
+        :param how, a string, inner for only rows matching in both, left for
+        every row of this file (the other fields empty where there's no
+        match)
+        :param outfile, optionally the path to, and name to write the
+        outfile to, or a writable stream (i.e. sys.stdout), rather than
+        returning the joined rows
+        :param memory_limit, an integer of bytes to hold the build side in
+
+        :rtype dictionary of the joined rows as a list of dictionaries, or
+        of filename and records written when given an outfile
+        """
+        if isinstance(on, str):
+            left_on, right_on = on, on
+        else:
+            left_on, right_on = on
+        if left_on not in self.headers:
+            raise FieldHeaderError(left_on, self.headers.keys())
+        if right_on not in other.headers:
+            raise FieldHeaderError(right_on, other.headers.keys())
+        how = how.upper()
+        if how not in ('INNER', 'LEFT'):
+            raise ValueError('how must be one of INNER, LEFT')
+        left_fields = [field for field in fields if field in self.headers]
+        right_fields = [
+            field for field in fields
+            if field not in self.headers and field in other.headers
+        ]
+        if len(left_fields) + len(right_fields) != len(fields):
+            raise FieldHeaderError(
+                fields, list(self.headers.keys()) + list(other.headers.keys())
+            )
+
+        left = self.__keyed_rows(left_on, left_fields)
+        right = other.__keyed_rows(right_on, right_fields)
+        left_size, right_size = self.__source_size(), other.__source_size()
+        build_is_left = left_size is not None and (
+            right_size is None or left_size <= right_size
+        )
+        if build_is_left:
+            pairs = join.hash_join(
+                left, right, True, how == 'LEFT', memory_limit
+            )
+        else:
+            pairs = join.hash_join(
+                right, left, False, how == 'LEFT', memory_limit
+            )
+        empty = ('', ) * len(right_fields)
+        if outfile is None:
+            rows = []
+            for left_row, right_row in pairs:
+                row = dict(zip(left_fields, left_row))
+                row.update(zip(right_fields, right_row or empty))
+                rows.append({field: row[field] for field in fields})
+            return {'data': rows}
+        result = {
+            'data': {
+                'filename': getattr(outfile, 'name', outfile),
+                'records': 0
+            }
+        }
+        with self.__open_sink(outfile) as wf:
+            wf.write(', '.join(fields) + '\n')
+            for left_row, right_row in pairs:
+                row = dict(zip(left_fields, left_row))
+                row.update(zip(right_fields, right_row or empty))
+                wf.write(self.__format_row(row, fields) + '\n')
+                result['data']['records'] += 1
+        return result
+
+    def build_zone_map(self, fields, block_size=zonemap.DEFAULT_BLOCK_SIZE):
+        """Builds a zone map of the data file, a sidecar alongside it holding
+        the min and max of fields per block of rows, which query and
+        group_by then use to skip the blocks that can't match their where -
+        a big saving on files ordered or clustered by those fields. A map
+        stays in use as the file grows (rows past it are scanned as usual),
+        rebuild it now and then to cover them
+
+        :param fields, a list of the fields to summarise
+        :param block_size, an integer, the bytes of rows per block
+
+        :rtype dictionary of the zone map's filename and blocks
+        """
+        if self.stream is not None:
+            raise ValueError('A stream source can not be zone mapped')
+        if isinstance(fields, str):
+            fields = [fields]
+        if not set(fields).issubset(set(self.headers.keys())):
+            raise FieldHeaderError(fields, self.headers.keys())
+        split = self.__splitter(fields)
+        types = self.__infer_types(split, fields)
+        with open(self.filename, 'rb') as f:
+            f.readline()
+            zones = zonemap.ZoneMap.build(
+                f, split, fields, types, block_size=block_size
+            )
+        path = zonemap.sidecar_path(self.filename)
+        zones.save(path)
+        return {'data': {'filename': path, 'blocks': len(zones.blocks)}}
+
+    def to_sqlite(self, path, indexes=None,
+                  batch_size=backend.DEFAULT_BATCH_SIZE, sample_size=None):
+        """Bulk loads the data file into an SQLite database, which query and
+        statistics then run against - worth it for files queried many times.
+        Values are stored as the text a scan reads, with field types
+        inferred from a sample of rows for typed comparisons
+
+        :param path, the path to the SQLite database, an existing table is
+        replaced
+        :param indexes, a list of fields to index
+        :param batch_size, an integer of rows to insert per batch
+        :param sample_size, an integer of rows to infer types from
+
+        :rtype dictionary of filename and records loaded
+        """
+        indexes = indexes or []
+        if not set(indexes).issubset(set(self.headers.keys())):
+            raise FieldHeaderError(indexes, self.headers.keys())
+        headers = sorted(self.headers, key=self.headers.get)
+        split = self.__splitter(headers)
+        types = converter.infer_types(
+            map(split, self.__sample(sample_size))
+        )
+        database = backend.SQLiteBackend(path, create=True)
+        with self.__open_source() as f:
+            rows, types = self.__first_row_types(
+                map(split, self.__lines(f)), types, headers
+            )
+            records = database.load(
+                headers, types, rows, indexes=indexes, batch_size=batch_size
+            )
+        self.backend = database
+        return {'data': {'filename': path, 'records': records}}
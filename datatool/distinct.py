@@ -0,0 +1,137 @@
+from . import spill
+from .bloom import BloomFilter
+
+DEFAULT_CAPACITY = 1000000
+# A rough allowance (bytes) for each key held in a set while verifying
+ENTRY_SIZE = 64
+# The share of the memory limit the Bloom filter's bits may take
+BLOOM_SHARE = 0.25
+
+
+def distinct(records, key, capacity=DEFAULT_CAPACITY, error_rate=0.01,
+             memory_limit=spill.DEFAULT_MEMORY_LIMIT, directory=None):
+    """Removes records with duplicate keys, keeping the first of each, with
+    bounded memory. Keys yielded are held in a set until it reaches the
+    memory limit, past that a Bloom filter decides - a key it has definitely
+    not seen is new and yielded straight away. The keys it may have seen are
+    candidates, held back in spill files partitioned by hash alongside the
+    keys already yielded, and checked exactly per partition once the records
+    run out (so candidates come after the other records). The filter is
+    sized for the capacity at the error rate but capped at a share of the
+    memory limit, so for many more keys than the limit allows for its
+    false positive rate is higher - more keys are checked from disk, the
+    result is still exact
+
+    :param records, an iterable of picklable records
+    :param key, a function returning the hashable key of a record
+    :param capacity, an integer, how many distinct keys are expected
+    :param error_rate, a float, the Bloom filter false positive rate, when
+    the memory limit allows the bits for it
+    :param memory_limit, an integer of bytes to hold keys in while checking
+    a partition
+    :param directory, the directory to spill partitions into
+    :rtype generator of records
+    """
+    bloom = BloomFilter(
+        capacity, error_rate, max_bits=int(memory_limit * BLOOM_SHARE) * 8
+    )
+    # Keys yielded are also held exactly until the memory limit, while every
+    # key fits a Bloom filter false positive can be told apart straight away
+    # and nothing needs writing to disk
+    known = set()
+    known_complete = True
+    size = 0
+    seen = [spill.SpillFile(directory) for _ in range(spill.PARTITIONS)]
+    candidates = [spill.SpillFile(directory) for _ in range(spill.PARTITIONS)]
+    try:
+        for record in records:
+            record_key = key(record)
+            if record_key in known:
+                continue
+            partition = spill.partition_of(record_key, 0)
+            if bloom.add(record_key) and not known_complete:
+                candidates[partition].write((record_key, record))
+                continue
+            if known_complete:
+                size += spill.record_size(record_key) + ENTRY_SIZE
+                if size < memory_limit:
+                    known.add(record_key)
+                else:
+                    # Past here candidates are checked against the spill
+                    # files, so they need every key yielded so far
+                    known_complete = False
+                    for known_key in known:
+                        seen[spill.partition_of(known_key, 0)].write(
+                            known_key
+                        )
+            if not known_complete:
+                seen[partition].write(record_key)
+            yield record
+        del bloom, known
+        for seen_partition, candidate_partition in zip(seen, candidates):
+            if candidate_partition.records:
+                yield from _verify(
+                    seen_partition, candidate_partition, memory_limit,
+                    directory, 1
+                )
+    finally:
+        for partition in seen + candidates:
+            partition.close()
+
+
+def _verify(seen, candidates, memory_limit, directory, level):
+    """Yields the candidates of a partition whose key wasn't yielded before,
+    in the order they arrived. When the partition's keys don't fit the
+    memory limit it is split again by the next bits of the hash - a key's
+    candidates always land in the same piece so their order holds
+
+    :param seen, a SpillFile of the keys already yielded
+    :param candidates, a SpillFile of tuples of key and record
+    :param memory_limit, an integer of bytes to hold keys in
+    :param directory, the directory to spill partitions into
+    :param level, an integer, how many times the keys were partitioned
+    :rtype generator of records
+    """
+    keys = set()
+    size = 0
+    for seen_key in seen:
+        keys.add(seen_key)
+        size += spill.record_size(seen_key) + ENTRY_SIZE
+        if (
+            size >= memory_limit and len(keys) > 1 and
+            level < spill.MAX_LEVEL
+        ):
+            yield from _split(seen, candidates, memory_limit, directory, level)
+            return
+    for candidate_key, record in candidates:
+        if candidate_key not in keys:
+            keys.add(candidate_key)
+            yield record
+
+
+def _split(seen, candidates, memory_limit, directory, level):
+    """Splits a partition's keys and candidates into smaller partitions and
+    verifies each of them
+
+    :rtype generator of records
+    """
+    seen_parts = [spill.SpillFile(directory) for _ in range(spill.PARTITIONS)]
+    candidate_parts = [
+        spill.SpillFile(directory) for _ in range(spill.PARTITIONS)
+    ]
+    try:
+        for seen_key in seen:
+            seen_parts[spill.partition_of(seen_key, level)].write(seen_key)
+        for candidate_key, record in candidates:
+            candidate_parts[spill.partition_of(candidate_key, level)].write(
+                (candidate_key, record)
+            )
+        for seen_part, candidate_part in zip(seen_parts, candidate_parts):
+            if candidate_part.records:
+                yield from _verify(
+                    seen_part, candidate_part, memory_limit, directory,
+                    level + 1
+                )
+    finally:
+        for part in seen_parts + candidate_parts:
+            part.close()
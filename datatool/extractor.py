@@ -0,0 +1,93 @@
+import re
+from functools import lru_cache
+
+# Characters that give a pattern a meaning beyond its literal text
+REGEX_SPECIAL_CHARACTERS = set('.^$*+?{}[]\\|()')
+# Patterns that match everything up to the first line break
+MATCH_ALL_PATTERNS = ('.*', '^.*')
+DEFAULT_CACHE_SIZE = 4096
+
+
+def analyse_pattern(pattern, group_idx=None):
+    """Works out the cheapest way to evaluate a search pattern
+
+    :param pattern, a compiled regex pattern
+    :param group_idx, an integer of the grouping to grab the result from
+    :rtype string, one of match_all, literal or regex
+    """
+    if group_idx is not None or pattern.flags != re.UNICODE:
+        return 'regex'
+    if pattern.pattern in MATCH_ALL_PATTERNS:
+        return 'match_all'
+    if pattern.pattern and not (
+        REGEX_SPECIAL_CHARACTERS & set(pattern.pattern)
+    ):
+        return 'literal'
+    return 'regex'
+
+
+def compile_search(search, cache_size=DEFAULT_CACHE_SIZE):
+    """Compiles a statistics search into a function taking a field value and
+    returning the extracted result (or None where there's no match)
+
+    Trivial patterns are answered with str methods, anything else runs the
+    regex behind a bounded LRU cache keyed on the raw value - fields tend to
+    repeat a small set of values so most rows never reach the regex engine
+
+    :param search, a dictionary of the search, required is the regex key
+    and either a pattern or string value, optional is group_idx
+    :param cache_size, an integer, the most distinct values to remember
+    :rtype function, regex backed functions expose cache_info()
+    """
+    try:
+        regex = re.compile(search['regex'])
+    except:
+        raise TypeError('Regex must be supplied as a string / pattern')
+    group_idx = search.get('group_idx')
+    strategy = analyse_pattern(regex, group_idx)
+    if strategy == 'match_all':
+        def extract(value):
+            return value.partition('\n')[0]
+    elif strategy == 'literal':
+        literal = regex.pattern
+
+        def extract(value):
+            return literal if literal in value else None
+    else:
+        regex_search = regex.search
+
+        @lru_cache(maxsize=cache_size)
+        def extract(value):
+            regex_result = regex_search(value)
+            if regex_result is None:
+                return None
+            if group_idx is not None:
+                return regex_result.groups()[group_idx]
+            return regex_result.group()
+    extract.strategy = strategy
+    return extract
+
+
+def cache_report(extract):
+    """Reports how the cache of a compiled search performed
+
+    :param extract, a function returned by compile_search
+    :rtype dictionary of strategy, hits, misses, hit_rate and size
+    """
+    report = {
+        'strategy': extract.strategy,
+        'hits': 0,
+        'misses': 0,
+        'hit_rate': 0.0,
+        'size': 0
+    }
+    if hasattr(extract, 'cache_info'):
+        info = extract.cache_info()
+        lookups = info.hits + info.misses
+        report.update({
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': info.hits / lookups if lookups else 0.0,
+            'size': info.currsize
+        })
+    return report
@@ -0,0 +1,229 @@
+import ctypes
+import ctypes.util
+import locale
+import os
+import select
+import struct
+import threading
+
+# Seconds to wait for new data when polling, doubled while the file is idle
+DEFAULT_POLL_INTERVAL = 0.05
+# The longest wait between checks of the file, polling or not
+DEFAULT_MAX_INTERVAL = 1.0
+CHUNK_SIZE = 64 * 1024
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+    IN_CREATE | IN_DELETE
+)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher():
+    """Waits for changes to a file with Linux inotify (through ctypes),
+    watching its directory so a file rotated into its place is seen too
+    """
+
+    def __init__(self, path, max_interval=DEFAULT_MAX_INTERVAL):
+        """
+        :param path, the path to the file to watch
+        :param max_interval, a float, the longest to wait for an event before
+        checking the file anyway
+        :raises OSError, when inotify isn't available
+        """
+        library = ctypes.util.find_library('c')
+        if library is None:
+            raise OSError('libc not found')
+        libc = ctypes.CDLL(library, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        directory, self.name = os.path.split(os.path.abspath(path))
+        watch = libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), WATCH_MASK
+        )
+        if watch < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), 'inotify_add_watch failed')
+        self.name = os.fsencode(self.name)
+        self.max_interval = max_interval
+
+    def wait(self):
+        """Waits until the file may have changed, or the max interval passes
+
+        :rtype boolean, True when an event for the file arrived
+        """
+        readable, _, _ = select.select([self.fd], [], [], self.max_interval)
+        if not readable:
+            return False
+        changed = False
+        try:
+            events = os.read(self.fd, CHUNK_SIZE)
+        except BlockingIOError:
+            return False
+        offset = 0
+        while offset < len(events):
+            _, _, _, length = EVENT_HEADER.unpack_from(events, offset)
+            offset += EVENT_HEADER.size
+            name = events[offset:offset + length].rstrip(b'\0')
+            offset += length
+            changed = changed or name == self.name
+        return changed
+
+    def reset(self):
+        """Nothing to reset, events arrive as soon as the file changes"""
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollWatcher():
+    """Waits for changes to a file by sleeping, starting at the poll interval
+    and doubling while nothing changes up to the max interval - so a busy
+    file is checked often and an idle one cheaply
+    """
+
+    def __init__(self, path, poll_interval=DEFAULT_POLL_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL):
+        """
+        :param path, the path to the file to watch
+        :param poll_interval, a float, the shortest wait in seconds
+        :param max_interval, a float, the longest wait in seconds
+        """
+        self.poll_interval = poll_interval
+        self.max_interval = max(max_interval, poll_interval)
+        self.interval = poll_interval
+        self.sleeper = threading.Event()
+
+    def wait(self):
+        """Sleeps for the current interval then doubles it
+
+        :rtype boolean, always False - the file has to be checked
+        """
+        self.sleeper.wait(self.interval)
+        self.interval = min(self.interval * 2, self.max_interval)
+        return False
+
+    def reset(self):
+        """Back to the shortest interval, as the file just changed"""
+        self.interval = self.poll_interval
+
+    def close(self):
+        pass
+
+
+def make_watcher(path, poll_interval=DEFAULT_POLL_INTERVAL,
+                 max_interval=DEFAULT_MAX_INTERVAL, inotify=True):
+    """Creates an inotify watcher for a file where available, falling back
+    to adaptive polling
+
+    :param path, the path to the file to watch
+    :param poll_interval, a float, the shortest wait when polling
+    :param max_interval, a float, the longest wait before checking the file
+    :param inotify, a boolean, False always polls
+    :rtype InotifyWatcher or PollWatcher
+    """
+    if inotify:
+        try:
+            return InotifyWatcher(path, max_interval)
+        except (OSError, AttributeError):
+            pass
+    return PollWatcher(path, poll_interval, max_interval)
+
+
+def _same_file(f, path):
+    """Whether the path still names the open file, False once it's rotated
+    away or removed
+
+    :rtype boolean
+    """
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return False
+    opened = os.fstat(f.fileno())
+    return (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino)
+
+
+def follow_lines(path, from_start=False, stop=None, watcher=None,
+                 encoding=None):
+    """Yields the complete lines appended to a file as they arrive, like
+    tail -F. Only whole lines are yielded, a partial line is held until its
+    line break is written. Each generation of the file starts with a header
+    line which is skipped - when the file shrinks it's taken as truncated and
+    read again from the start, and when it's rotated (a new file moved or
+    created in its place) the rest of the old file is read before the new
+    one is followed
+
+    :param path, the path to the file to follow
+    :param from_start, a boolean, True yields the lines already in the file
+    first, otherwise only lines appended after the call
+    :param stop, optionally a threading.Event, following ends once it's set
+    :param watcher, what waits for the file to change, defaults to
+    make_watcher(path)
+    :param encoding, the encoding to decode lines with, defaults to the one
+    open uses
+    :rtype generator of strings
+    """
+    encoding = encoding or locale.getpreferredencoding(False)
+    stop = stop or threading.Event()
+    watcher = watcher or make_watcher(path)
+    f = open(path, 'rb')
+    try:
+        if from_start:
+            # The header is the first line of a generation
+            skip = True
+        else:
+            size = f.seek(0, os.SEEK_END)
+            # Starting part way through a line, skip to the next whole one
+            # (or skip the header when it's all there is yet)
+            skip = size == 0
+            if size:
+                f.seek(size - 1)
+                skip = f.read(1) != b'\n'
+        buffer = b''
+        while not stop.is_set():
+            chunk = f.read(CHUNK_SIZE)
+            if chunk:
+                watcher.reset()
+                lines = (buffer + chunk).split(b'\n')
+                buffer = lines.pop()
+                if skip and lines:
+                    lines = lines[1:]
+                    skip = False
+                for line in lines:
+                    yield line.decode(encoding, errors='replace') + '\n'
+                continue
+            if not _same_file(f, path):
+                if not os.path.exists(path):
+                    watcher.wait()
+                    continue
+                # Rotated, the old file is drained so its last partial line
+                # was all the writer will write
+                if buffer and not skip:
+                    yield buffer.decode(encoding, errors='replace') + '\n'
+                f.close()
+                f = open(path, 'rb')
+                buffer, skip = b'', True
+                continue
+            if os.fstat(f.fileno()).st_size < f.tell():
+                # Truncated, start over from the new header. Only a shrink
+                # is taken as one - a touch or other write that leaves the
+                # size alone changes nothing that's been read
+                f.seek(0)
+                buffer, skip = b'', True
+                continue
+            watcher.wait()
+    finally:
+        f.close()
+        watcher.close()
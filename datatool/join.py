@@ -0,0 +1,115 @@
+from . import spill
+
+# A rough allowance (bytes) for each key held in the build table
+ENTRY_SIZE = 64
+
+
+def hash_join(build, probe, build_is_left=False, left_outer=False,
+              memory_limit=spill.DEFAULT_MEMORY_LIMIT, directory=None,
+              level=0):
+    """Joins two iterables of (key, row) pairs, building a hash table of the
+    build side then streaming the probe side against it. When the build side
+    outgrows the memory limit both sides are partitioned to disk by the hash
+    of their keys and each pair of partitions is joined in turn (a grace hash
+    join). A key of None never matches, so such rows are never held - they
+    are dropped, or yielded unmatched straight away for the left side of a
+    left join. The rows of a single key can't be partitioned apart, so a key
+    whose rows outgrow the memory limit is held in memory whole
+
+    :param build, an iterable of tuples of key and row, the smaller side
+    :param probe, an iterable of tuples of key and row
+    :param build_is_left, a boolean, True when the build side is the left of
+    the join - pairs are always yielded left first
+    :param left_outer, a boolean, True also yields left rows with no match
+    (paired with None)
+    :param memory_limit, an integer of bytes to hold the build table in
+    :param directory, the directory to spill partitions into
+    :param level, an integer, how many times the sides were partitioned
+    :rtype generator of tuples of left row and right row
+    """
+    table = {}
+    size = 0
+    build = iter(build)
+    for key, row in build:
+        if key is None:
+            if left_outer and build_is_left:
+                yield row, None
+            continue
+        entry = table.get(key)
+        if entry is None:
+            # [matched, rows] - matched tracks unmatched left build rows
+            entry = table[key] = [False, []]
+            size += spill.record_size(key) + ENTRY_SIZE
+        entry[1].append(row)
+        size += spill.record_size(row)
+        if (
+            size >= memory_limit and len(table) > 1 and
+            level < spill.MAX_LEVEL
+        ):
+            yield from _grace_join(
+                table, build, probe, build_is_left, left_outer,
+                memory_limit, directory, level
+            )
+            return
+
+    for key, row in probe:
+        entry = table.get(key) if key is not None else None
+        if entry is not None:
+            entry[0] = True
+            for build_row in entry[1]:
+                if build_is_left:
+                    yield build_row, row
+                else:
+                    yield row, build_row
+        elif left_outer and not build_is_left:
+            yield row, None
+    if left_outer and build_is_left:
+        for key, (matched, rows) in table.items():
+            if not matched:
+                for build_row in rows:
+                    yield build_row, None
+
+
+def _grace_join(table, build, probe, build_is_left, left_outer,
+                memory_limit, directory, level):
+    """Partitions both sides of a join to disk, the build table so far then
+    the rest of each side, and joins each pair of partitions
+
+    :rtype generator of tuples of left row and right row
+    """
+    build_partitions = [
+        spill.SpillFile(directory) for _ in range(spill.PARTITIONS)
+    ]
+    probe_partitions = [
+        spill.SpillFile(directory) for _ in range(spill.PARTITIONS)
+    ]
+    try:
+        for key, (_, rows) in table.items():
+            partition = build_partitions[spill.partition_of(key, level)]
+            for row in rows:
+                partition.write((key, row))
+        table.clear()
+        for key, row in build:
+            if key is not None:
+                build_partitions[spill.partition_of(key, level)].write(
+                    (key, row)
+                )
+            elif left_outer and build_is_left:
+                yield row, None
+        for key, row in probe:
+            if key is not None:
+                probe_partitions[spill.partition_of(key, level)].write(
+                    (key, row)
+                )
+            elif left_outer and not build_is_left:
+                yield row, None
+        for build_partition, probe_partition in zip(
+            build_partitions, probe_partitions
+        ):
+            yield from hash_join(
+                build_partition, probe_partition, build_is_left, left_outer,
+                memory_limit, directory, level + 1
+            )
+    finally:
+        for partition in build_partitions + probe_partitions:
+            partition.close()
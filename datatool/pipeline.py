@@ -0,0 +1,231 @@
+import queue
+import threading
+import time
+
+# The characters read from the source at a time
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+# How many batches each queue holds before its producer waits
+DEFAULT_DEPTH = 8
+# The output lines handed to the writer at a time
+DEFAULT_BATCH_SIZE = 4096
+# Seconds between checks that the other stages are still running
+CHECK_INTERVAL = 0.1
+
+_END = object()
+
+
+class Cancelled(Exception):
+    """Raised in a stage when another stage has stopped the pipeline"""
+
+
+class _Failure():
+    """Carries an exception from the reader to the stage reading its queue"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class Pipeline():
+    """Overlaps reading, processing and writing a scan. A reader thread
+    reads the source in large blocks and a writer thread makes large writes
+    to the sink, while the calling thread processes the lines between them.
+    The stages are joined by bounded queues, so a stage that gets ahead
+    waits for the next (backpressure) and memory stays bounded. The time
+    each stage spends waiting is reported - the stage the others wait on is
+    the bottleneck
+    """
+
+    def __init__(self, block_size=DEFAULT_BLOCK_SIZE, depth=DEFAULT_DEPTH,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        """
+        :param block_size, an integer, the characters to read at a time
+        :param depth, an integer, the batches each queue holds
+        :param batch_size, an integer, the output lines written at a time
+        """
+        self.block_size = block_size
+        self.depth = depth
+        self.batch_size = batch_size
+        self.stop = threading.Event()
+        self.stalls = {
+            'reader': {'blocked': 0.0},
+            'processor': {'starved': 0.0, 'blocked': 0.0},
+            'writer': {'starved': 0.0}
+        }
+
+    def __put(self, channel, item):
+        """[PRIVATE] Puts an item on a queue, waiting while it's full
+
+        :rtype float, the seconds spent waiting
+        """
+        try:
+            channel.put_nowait(item)
+            return 0.0
+        except queue.Full:
+            pass
+        started = time.perf_counter()
+        while True:
+            try:
+                channel.put(item, timeout=CHECK_INTERVAL)
+                return time.perf_counter() - started
+            except queue.Full:
+                if self.stop.is_set():
+                    raise Cancelled()
+
+    def __get(self, channel):
+        """[PRIVATE] Gets an item from a queue, waiting while it's empty
+
+        :rtype tuple of the item and the seconds spent waiting
+        """
+        try:
+            return channel.get_nowait(), 0.0
+        except queue.Empty:
+            pass
+        started = time.perf_counter()
+        while True:
+            try:
+                item = channel.get(timeout=CHECK_INTERVAL)
+                return item, time.perf_counter() - started
+            except queue.Empty:
+                if self.stop.is_set():
+                    raise Cancelled()
+
+    def __blocks(self, source):
+        """[PRIVATE] Batches of lines of a source, read in large blocks from
+        a file object, or gathered from any other iterable of lines
+
+        :rtype generator of lists of strings
+        """
+        if not hasattr(source, 'read'):
+            batch = []
+            for line in source:
+                batch.append(line)
+                if len(batch) >= self.batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+            return
+        rest = ''
+        while True:
+            block = source.read(self.block_size)
+            if not block:
+                break
+            lines = (rest + block).split('\n')
+            rest = lines.pop()
+            if lines:
+                yield [line + '\n' for line in lines]
+        if rest:
+            yield [rest]
+
+    def __read(self, source, channel):
+        """[PRIVATE] The reader stage, runs in its own thread"""
+        try:
+            for batch in self.__blocks(source):
+                self.stalls['reader']['blocked'] += self.__put(
+                    channel, batch
+                )
+            self.__put(channel, _END)
+        except Cancelled:
+            pass
+        except BaseException as e:
+            try:
+                self.__put(channel, _Failure(e))
+            except Cancelled:
+                pass
+
+    def read(self, source):
+        """Reads a source in a reader thread, handing on its lines
+
+        :param source, a file object to read in blocks, or an iterable of
+        lines
+        :rtype generator of strings
+        """
+        channel = queue.Queue(self.depth)
+        reader = threading.Thread(
+            target=self.__read, args=(source, channel), daemon=True
+        )
+        reader.start()
+        finished = False
+        try:
+            while True:
+                batch, stalled = self.__get(channel)
+                self.stalls['processor']['starved'] += stalled
+                if batch is _END:
+                    finished = True
+                    return
+                if isinstance(batch, _Failure):
+                    raise batch.error
+                yield from batch
+        finally:
+            if not finished:
+                # Stopped early, so the reader has to be told to stop too
+                self.stop.set()
+            reader.join()
+
+    def __write(self, sink, channel, errors):
+        """[PRIVATE] The writer stage, runs in its own thread"""
+        try:
+            while True:
+                batch, stalled = self.__get(channel)
+                self.stalls['writer']['starved'] += stalled
+                if batch is _END:
+                    return
+                sink.write(''.join(batch))
+        except Cancelled:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            self.stop.set()
+
+    def write(self, sink, lines):
+        """Writes lines to a sink in a writer thread, batching them into
+        large writes. Iterating the lines is the processing stage, run in
+        the calling thread
+
+        :param sink, an object with a write method
+        :param lines, an iterable of strings, each ending in a line break
+        :rtype integer, the lines written
+        """
+        channel = queue.Queue(self.depth)
+        errors = []
+        writer = threading.Thread(
+            target=self.__write, args=(sink, channel, errors), daemon=True
+        )
+        writer.start()
+        written = 0
+        try:
+            batch = []
+            for line in lines:
+                batch.append(line)
+                if len(batch) >= self.batch_size:
+                    self.stalls['processor']['blocked'] += self.__put(
+                        channel, batch
+                    )
+                    written += len(batch)
+                    batch = []
+            if batch:
+                self.__put(channel, batch)
+                written += len(batch)
+            self.__put(channel, _END)
+        except Cancelled:
+            # The writer failed, its error is raised below
+            pass
+        except BaseException:
+            self.stop.set()
+            writer.join()
+            raise
+        writer.join()
+        if errors:
+            raise errors[0]
+        return written
+
+    def report(self):
+        """The seconds each stage spent waiting on the others
+
+        :rtype dictionary of stages and their stalls
+        """
+        return {
+            stage: {
+                kind: round(seconds, 4) for kind, seconds in stalls.items()
+            } for stage, stalls in self.stalls.items()
+        }
@@ -0,0 +1,109 @@
+import locale
+import math
+from collections import deque
+from itertools import islice
+from statistics import NormalDist
+
+DEFAULT_CONFIDENCE = 0.95
+
+
+def _uniform(rng):
+    """A random float in the open interval (0, 1), safe to take the log of
+
+    :param rng, a random.Random
+    :rtype float
+    """
+    value = rng.random()
+    while value == 0.0:
+        value = rng.random()
+    return value
+
+
+def reservoir(items, size, rng):
+    """Picks a uniform random sample of items in one pass without knowing how
+    many there are, by reservoir sampling. Runs of items between
+    replacements are skipped in bulk (Algorithm L) so each item skipped
+    costs no Python work
+
+    :param items, an iterable
+    :param size, an integer, how many items to pick
+    :param rng, a random.Random
+    :rtype tuple of the list of items picked and the count of all items
+    """
+    items = enumerate(items, 1)
+    picked = [item for _, item in islice(items, size)]
+    total = len(picked)
+    if total < size:
+        return picked, total
+    weight = math.exp(math.log(_uniform(rng)) / size)
+    while True:
+        skip = int(math.log(_uniform(rng)) / math.log(1 - weight))
+        skipped = deque(islice(items, skip), maxlen=1)
+        if skipped:
+            total = skipped[0][0]
+        following = next(items, None)
+        if following is None:
+            return picked, total
+        total, item = following
+        picked[rng.randrange(size)] = item
+        weight *= math.exp(math.log(_uniform(rng)) / size)
+
+
+def seek_lines(f, start, end, size, rng, encoding=None):
+    """Picks lines of a file at random by seeking to random byte offsets and
+    taking the line after the boundary each lands past, wrapping to the
+    first line from the last. A line's chance of being picked follows the
+    length of the line before it, so with no relation between neighbouring
+    lines the sample is close to uniform
+
+    :param f, a file object opened in binary mode
+    :param start, an integer, the offset of the first line to pick from
+    :param end, an integer, the offset of the end of the last line
+    :param size, an integer, how many lines to pick (with replacement)
+    :param rng, a random.Random
+    :param encoding, the encoding to decode lines with, defaults to the one
+    open uses
+    :rtype tuple of the list of lines picked and their mean length in bytes
+    """
+    encoding = encoding or locale.getpreferredencoding(False)
+    lines = []
+    length = 0
+    # Seeking in order keeps reads moving forward through the file
+    for offset in sorted(rng.randrange(start, end) for _ in range(size)):
+        f.seek(offset)
+        f.readline()
+        line = f.readline() if f.tell() < end else b''
+        if not line:
+            f.seek(start)
+            line = f.readline()
+        length += len(line)
+        lines.append(line.decode(encoding, errors='replace'))
+    return lines, length / len(lines) if lines else 0
+
+
+def wilson_interval(hits, rows, confidence=DEFAULT_CONFIDENCE,
+                    population=None):
+    """The Wilson score interval of a proportion estimated from a sample,
+    narrowed by the finite population correction when the sample was drawn
+    without replacement from a known population
+
+    :param hits, an integer, how many sampled rows had the value
+    :param rows, an integer, how many rows were sampled
+    :param confidence, a float, the confidence level of the interval
+    :param population, an integer, how many rows were sampled from
+    :rtype tuple of the low and high proportions
+    """
+    if not rows:
+        return 0.0, 1.0
+    proportion = hits / rows
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    if population is not None:
+        if population <= rows:
+            return proportion, proportion
+        z *= math.sqrt((population - rows) / (population - 1))
+    denominator = 1 + z ** 2 / rows
+    centre = (proportion + z ** 2 / (2 * rows)) / denominator
+    spread = z * math.sqrt(
+        proportion * (1 - proportion) / rows + z ** 2 / (4 * rows ** 2)
+    ) / denominator
+    return max(centre - spread, 0.0), min(centre + spread, 1.0)
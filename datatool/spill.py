@@ -0,0 +1,185 @@
+import heapq
+import pickle
+import sys
+import tempfile
+
+# The default memory budget (bytes) for operations that spill to disk
+DEFAULT_MEMORY_LIMIT = 64 * 1024 * 1024
+# Partitions are picked by 4 bits of the key's hash per level of splitting
+PARTITION_BITS = 4
+PARTITIONS = 2 ** PARTITION_BITS
+MAX_LEVEL = 64 // PARTITION_BITS - 1
+# The most sorted runs merged at once, each is an open temporary file
+MAX_MERGE = 64
+
+
+class SpillFile():
+    """A temporary file of pickled records, written in one pass then read
+    back in the same order, removed from disk once closed
+    """
+
+    def __init__(self, directory=None):
+        """
+        :param directory, the directory to create the file in, defaults to
+        the system temporary directory
+        """
+        self.file = tempfile.TemporaryFile(dir=directory)
+        self.records = 0
+
+    def write(self, record):
+        """Appends a record to the file
+
+        :param record, any picklable object
+        """
+        self.file.write(pickle.dumps(record, pickle.HIGHEST_PROTOCOL))
+        self.records += 1
+
+    def __iter__(self):
+        self.file.flush()
+        self.file.seek(0)
+        load = pickle.load
+        for _ in range(self.records):
+            yield load(self.file)
+
+    def close(self):
+        self.file.close()
+
+
+class OrderKey():
+    """A sort key over a tuple of values where each position has its own
+    direction, for ordering by several keys that mix ascending and
+    descending
+    """
+    __slots__ = ('values', 'descending')
+
+    def __init__(self, values, descending):
+        """
+        :param values, a tuple of the values to compare
+        :param descending, a tuple of booleans, True where the value at that
+        position sorts descending
+        """
+        self.values = values
+        self.descending = descending
+
+    def __lt__(self, other):
+        for mine, theirs, descending in zip(
+            self.values, other.values, self.descending
+        ):
+            if mine != theirs:
+                return mine > theirs if descending else mine < theirs
+        return False
+
+
+def partition_of(key, level):
+    """Picks the partition of a key, each level of splitting takes the next
+    bits of the hash so a partition can be split again evenly
+
+    :param key, a hashable key
+    :param level, an integer, how many times the key was partitioned
+    :rtype integer of the partition
+    """
+    return (hash(key) >> (level * PARTITION_BITS)) % PARTITIONS
+
+
+def record_size(record):
+    """Estimates the memory used by a record (and one level of the items it
+    holds, which is as deep as rows and keys go)
+
+    :param record, an object, usually a tuple
+    :rtype integer of bytes
+    """
+    size = sys.getsizeof(record)
+    if isinstance(record, (tuple, list)):
+        for item in record:
+            size += sys.getsizeof(item)
+    return size
+
+
+def _merge_runs(runs, key, reverse, directory):
+    """Merges sorted runs into one, closing them
+
+    :param runs, a list of SpillFiles in the order they were written
+    :rtype SpillFile
+    """
+    merged = SpillFile(directory)
+    try:
+        for record in heapq.merge(*runs, key=key, reverse=reverse):
+            merged.write(record)
+    except BaseException:
+        merged.close()
+        raise
+    for run in runs:
+        run.close()
+    return merged
+
+
+def external_sort(records, key=None, reverse=False,
+                  memory_limit=DEFAULT_MEMORY_LIMIT, directory=None):
+    """Sorts records with bounded memory - sorted runs that fit in the memory
+    limit are spilled to temporary files, then k-way merged with a heap. The
+    sort is stable, so equal records keep the order they arrived in. Each
+    run is an open file, so no more than MAX_MERGE are merged at once -
+    once a level holds that many runs they're merged into one run of the
+    next level, keeping the open files to MAX_MERGE per level (a level
+    holds MAX_MERGE times the records of the one below)
+
+    :param records, an iterable of picklable records
+    :param key, a function returning the value to sort a record by
+    :param reverse, a boolean, True sorts descending
+    :param memory_limit, an integer of bytes to hold in memory per run
+    :param directory, the directory to spill runs into
+    :rtype generator of records in sorted order
+    """
+    # The runs of each level, every run of a level holds records that
+    # arrived before those of the levels below
+    levels = [[]]
+    run = []
+    size = 0
+    try:
+        for record in records:
+            run.append(record)
+            size += record_size(record)
+            if size >= memory_limit:
+                run.sort(key=key, reverse=reverse)
+                spill_file = SpillFile(directory)
+                for sorted_record in run:
+                    spill_file.write(sorted_record)
+                levels[0].append(spill_file)
+                run = []
+                size = 0
+                level = 0
+                while len(levels[level]) >= MAX_MERGE:
+                    if level + 1 == len(levels):
+                        levels.append([])
+                    levels[level + 1].append(_merge_runs(
+                        levels[level], key, reverse, directory
+                    ))
+                    levels[level] = []
+                    level += 1
+        run.sort(key=key, reverse=reverse)
+        runs = [
+            spill_file for level_runs in reversed(levels)
+            for spill_file in level_runs
+        ]
+        if not runs:
+            yield from run
+            return
+        while len(runs) > MAX_MERGE:
+            # Merge neighbouring runs, so the records keep their order
+            merged = []
+            levels.append(merged)
+            for idx in range(0, len(runs), MAX_MERGE):
+                group = runs[idx:idx + MAX_MERGE]
+                merged.append(
+                    group[0] if len(group) == 1 else
+                    _merge_runs(group, key, reverse, directory)
+                )
+            runs = merged
+        # Merge the in memory run last - heapq.merge is stable by the order
+        # of its iterables and this run holds the latest records
+        for merged in heapq.merge(*runs, run, key=key, reverse=reverse):
+            yield merged
+    finally:
+        for level_runs in levels:
+            for spill_file in level_runs:
+                spill_file.close()
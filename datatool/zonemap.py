@@ -0,0 +1,334 @@
+import datetime
+import io
+import json
+import locale
+import math
+import os
+import re
+import zlib
+from dateutil.parser import parse
+
+# The bytes of rows summarised by each zone (block), rounded up to a line
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+SUFFIX = '.zonemap'
+# The bytes at the start and end of the mapped data checked to tell it's
+# unchanged
+CHECK_SIZE = 4096
+
+
+def sidecar_path(filename):
+    """The path of the zone map of a data file, kept alongside it
+
+    :param filename, the path to the data file
+    :rtype string
+    """
+    return filename + SUFFIX
+
+
+def _checksum(f, end):
+    """The CRCs of the bytes at the start of a file and just before an
+    offset
+
+    :param f, a file object opened in binary mode
+    :param end, an integer offset
+    :rtype list of two integers
+    """
+    f.seek(0)
+    head = zlib.crc32(f.read(min(end, CHECK_SIZE)))
+    f.seek(max(end - CHECK_SIZE, 0))
+    return [head, zlib.crc32(f.read(min(end, CHECK_SIZE)))]
+
+
+def _stamp(state):
+    """The identity of a file when its zone map was built, the inode, size
+    and modified time of its stat
+
+    :param state, an os.stat_result
+    :rtype list of three integers
+    """
+    return [state.st_ino, state.st_size, state.st_mtime_ns]
+
+
+# Plain ISO 8601 dates, which datetime reads the same as dateutil but faster
+ISO_DATE = re.compile(
+    r'\d{4}-\d{2}-\d{2}([ T]\d{2}:\d{2}(:\d{2}(\.\d{1,6})?)?)?$'
+)
+
+
+def _parse_date(value):
+    """Parses a date string as the scan does, taking the fast path for
+    plain ISO 8601 dates
+
+    :param value, a string
+    :rtype datetime
+    """
+    if ISO_DATE.match(value):
+        try:
+            return datetime.datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    return parse(value)
+
+
+def _summarise(values, data_type):
+    """Summarises the values of a field in a block as the min and max of
+    their text, and of the numbers or dates among them for numeric or date
+    fields - values that aren't numbers or dates never satisfy a comparison
+    of that type, so are left out, and a bound of None means there were none
+
+    :param values, a list of strings
+    :param data_type, the type inferred for the field
+    :rtype dictionary of text and optionally numeric or date bounds
+    """
+    summary = {'text': [min(values), max(values)] if values else None}
+    if data_type == 'numeric':
+        numbers = []
+        for value in values:
+            try:
+                number = float(value)
+            except ValueError:
+                continue
+            if not math.isnan(number):
+                numbers.append(number)
+        summary['numeric'] = [min(numbers), max(numbers)] if numbers else None
+    elif data_type == 'date':
+        dates = []
+        for value in values:
+            try:
+                date = _parse_date(value)
+            except (ValueError, OverflowError):
+                continue
+            if date.tzinfo is not None:
+                # Aware dates don't order against naive ones, so the field
+                # can't be summarised
+                return summary
+            dates.append(date.isoformat())
+        summary['date'] = [min(dates), max(dates)] if dates else None
+    return summary
+
+
+def _within(bounds, low, high):
+    """Whether a block's bounds overlap an inclusive range
+
+    :param bounds, a list of the block's min and max, or None
+    :param low, the low end of the range
+    :param high, the high end of the range
+    :rtype boolean
+    """
+    if bounds is None:
+        return False
+    return bounds[1] >= low and bounds[0] <= high
+
+
+class ZoneMap():
+    """A sidecar summarising each fixed size block of a data file by the min
+    and max of chosen fields, so a query can skip the blocks whose values
+    can't satisfy its where. Cheap to build and store, and on data ordered
+    (or clustered) by a field most blocks fall outside a range on it
+    """
+
+    def __init__(self, fields, blocks, covered, checksum, stamp=None):
+        """
+        :param fields, a list of the fields summarised
+        :param blocks, a list of dictionaries of each block's offset, length
+        and field summaries
+        :param covered, an integer, the offset the blocks run up to
+        :param checksum, a list of the CRCs of the bytes at the start of the
+        file and before covered
+        :param stamp, a list of the inode, size and modified time of the
+        file when built, None when it was built from a stream
+        """
+        self.fields = fields
+        self.blocks = blocks
+        self.covered = covered
+        self.checksum = checksum
+        self.stamp = stamp
+
+    @classmethod
+    def build(cls, f, split, fields, types, block_size=DEFAULT_BLOCK_SIZE,
+              encoding=None):
+        """Builds the zone map of a data file in one pass
+
+        :param f, the data file opened in binary mode, positioned after the
+        header line
+        :param split, a function converting a line into a row dictionary
+        :param fields, a list of the fields to summarise
+        :param types, a dictionary of fields and their inferred types
+        :param block_size, an integer, the bytes of rows per block
+        :param encoding, the encoding to decode lines with, defaults to the
+        one open uses
+        :rtype ZoneMap
+        """
+        encoding = encoding or locale.getpreferredencoding(False)
+        try:
+            # Taken before reading, so a write during the build is seen
+            stamp = _stamp(os.fstat(f.fileno()))
+        except (AttributeError, io.UnsupportedOperation):
+            stamp = None
+        blocks = []
+        offset = position = f.tell()
+        values = {field: [] for field in fields}
+
+        def close_block():
+            blocks.append({
+                'offset': offset,
+                'length': position - offset,
+                'fields': {
+                    field: _summarise(values[field], types.get(field))
+                    for field in fields
+                }
+            })
+
+        for line in iter(f.readline, b''):
+            if not line.endswith(b'\n'):
+                # A partial last line, it's left for a later build
+                break
+            row = split(line.decode(encoding))
+            for field in fields:
+                values[field].append(row[field])
+            position += len(line)
+            if position - offset >= block_size:
+                close_block()
+                offset = position
+                values = {field: [] for field in fields}
+        if position > offset:
+            close_block()
+        return cls(fields, blocks, position, _checksum(f, position), stamp)
+
+    def save(self, path):
+        """Writes the zone map to a JSON file
+
+        :param path, the path to write to
+        """
+        with open(path, 'w') as f:
+            json.dump({
+                'fields': self.fields,
+                'blocks': self.blocks,
+                'covered': self.covered,
+                'checksum': self.checksum,
+                'stamp': self.stamp
+            }, f)
+
+    @classmethod
+    def load(cls, path):
+        """Reads a zone map written by save
+
+        :param path, the path to the zone map
+        :rtype ZoneMap
+        """
+        with open(path, 'r') as f:
+            data = json.load(f)
+        return cls(
+            data['fields'], data['blocks'], data['covered'], data['checksum'],
+            data.get('stamp')
+        )
+
+    def fresh(self, filename):
+        """Whether the zone map still describes a data file - the file may
+        have grown since (the rows past the map are scanned as usual) but
+        the mapped bytes must be unchanged. A file replaced by another
+        (a new inode), or modified without growing, is taken as rewritten,
+        and the bytes at the start and end of the mapped data must match.
+        Reading every mapped byte would cost as much as the scan the map
+        saves, so an append that also rewrites the middle goes unseen
+
+        :param filename, the path to the data file
+        :rtype boolean
+        """
+        state = os.stat(filename)
+        if state.st_size < self.covered:
+            return False
+        if self.stamp is not None:
+            inode, size, modified = self.stamp
+            if state.st_ino != inode or (
+                state.st_mtime_ns != modified and state.st_size <= size
+            ):
+                return False
+        with open(filename, 'rb') as f:
+            return _checksum(f, self.covered) == self.checksum
+
+    @staticmethod
+    def may_match(block, query):
+        """Whether any row of a block may satisfy a where clause
+
+        :param block, a dictionary of the block's offset, length and fields
+        :param query, a prepared where clause with field, condition and value
+        :rtype boolean, False only when no row can
+        """
+        summary = block['fields'].get(query['field'])
+        if summary is None:
+            return True
+        condition = query['condition']
+        value = query.get('value')
+        if isinstance(value, datetime.datetime):
+            if value.tzinfo is not None:
+                return True
+            value = value.isoformat()
+        elif isinstance(value, tuple) and len(value) == 2:
+            if isinstance(value[0], datetime.datetime):
+                if value[0].tzinfo is not None or value[1].tzinfo is not None:
+                    return True
+                value = (value[0].isoformat(), value[1].isoformat())
+        kind = {
+            'GREATER': 'numeric',
+            'LESS': 'numeric',
+            'BEFORE': 'date',
+            'AFTER': 'date',
+            'EQUALS': 'text'
+        }.get(condition)
+        if condition == 'BETWEEN':
+            low = query['value'][0]
+            kind = (
+                'numeric' if isinstance(low, float) else
+                'date' if isinstance(low, datetime.datetime) else
+                'text'
+            )
+        if kind is None or kind not in summary:
+            return True
+        bounds = summary[kind]
+        try:
+            if condition in ('GREATER', 'AFTER'):
+                return bounds is not None and bounds[1] > value
+            elif condition in ('LESS', 'BEFORE'):
+                return bounds is not None and bounds[0] < value
+            elif condition == 'EQUALS':
+                return _within(bounds, value, value)
+            return _within(bounds, value[0], value[1])
+        except TypeError:
+            return True
+
+    def candidate_blocks(self, where, match_all=True):
+        """The blocks that may hold rows matching a where
+
+        :param where, a list of prepared where clauses
+        :param match_all, a boolean, True when the clauses are ANDed
+        :rtype list of block dictionaries
+        """
+        if not where:
+            return list(self.blocks)
+        test = all if match_all else any
+        return [
+            block for block in self.blocks
+            if test(self.may_match(block, query) for query in where)
+        ]
+
+    def lines(self, filename, blocks, encoding=None):
+        """Reads the lines of the given blocks of a data file, then every
+        line past the mapped blocks
+
+        :param filename, the path to the data file
+        :param blocks, a list of block dictionaries, in file order
+        :param encoding, the encoding to decode lines with, defaults to the
+        one open uses
+        :rtype generator of strings
+        """
+        encoding = encoding or locale.getpreferredencoding(False)
+        with open(filename, 'rb') as f:
+            for block in blocks:
+                f.seek(block['offset'])
+                data = f.read(block['length']).decode(encoding)
+                for line in data.split('\n')[:-1]:
+                    yield line + '\n'
+            f.seek(self.covered)
+            for line in iter(f.readline, b''):
+                yield line.decode(encoding)
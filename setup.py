@@ -7,7 +7,12 @@ setup(
     author='Matt Barber',
     author_email='mfmbarber@gmail.com',
     license='MIT',
-    packages=['datatool'],
+    packages=['datatool', 'datatool.config'],
+    entry_points={
+        'console_scripts': [
+            'datatool=datatool.cli:main'
+        ]
+    },
     install_requires=[
         'dateutil'
     ]
@@ -0,0 +1,89 @@
+import unittest
+from ..datatool import aggregate
+
+
+class TestAggregate(unittest.TestCase):
+    def setUp(self):
+        self.rows = [
+            {'location': 'malibu', 'age': '37', 'dob': '31/05/1976'},
+            {'location': 'malibu', 'age': '9', 'dob': '12/12/2000'},
+            {'location': 'asgard', 'age': '1500', 'dob': '01/01/1900'},
+            {'location': 'asgard', 'age': '', 'dob': '01/01/1901'},
+            {'location': 'new york', 'age': '100', 'dob': '04/07/1920'},
+        ]
+        self.aggregates = [
+            {'function': 'count'},
+            {'function': 'count', 'field': 'age'},
+            {'function': 'sum', 'field': 'age'},
+            {'function': 'avg', 'field': 'age'},
+            {'function': 'max', 'field': 'age'},
+            {'function': 'min', 'field': 'dob'},
+        ]
+        self.types = {'age': 'numeric', 'dob': 'date'}
+        self.expected = {
+            'malibu': {
+                'count(*)': 2,
+                'count(age)': 2,
+                'sum(age)': 46.0,
+                'avg(age)': 23.0,
+                'max(age)': '37',
+                'min(dob)': '31/05/1976'
+            },
+            'asgard': {
+                'count(*)': 2,
+                'count(age)': 1,
+                'sum(age)': 1500.0,
+                'avg(age)': 1500.0,
+                'max(age)': '1500',
+                'min(dob)': '01/01/1900'
+            },
+            'new york': {
+                'count(*)': 1,
+                'count(age)': 1,
+                'sum(age)': 100.0,
+                'avg(age)': 100.0,
+                'max(age)': '100',
+                'min(dob)': '04/07/1920'
+            }
+        }
+
+    def test_aggregator_invalid_function_raises_exception(self):
+        with self.assertRaises(ValueError):
+            aggregate.Aggregator([{'function': 'median'}], {})
+
+    def test_hash_aggregate_in_memory(self):
+        aggregator = aggregate.Aggregator(self.aggregates, self.types)
+        groups = aggregate.hash_aggregate(
+            self.rows,
+            lambda row: row['location'],
+            aggregator
+        )
+        self.assertDictEqual(dict(groups), self.expected)
+
+    def test_hash_aggregate_spilled_matches_in_memory(self):
+        aggregator = aggregate.Aggregator(self.aggregates, self.types)
+        groups = aggregate.hash_aggregate(
+            self.rows * 3,
+            lambda row: row['location'],
+            aggregator,
+            memory_limit=1
+        )
+        result = dict(groups)
+        self.assertEqual(result['malibu']['count(*)'], 6)
+        self.assertEqual(result['asgard']['sum(age)'], 4500.0)
+        self.assertEqual(result['asgard']['avg(age)'], 1500.0)
+        self.assertEqual(result['new york']['min(dob)'], '04/07/1920')
+
+    def test_hash_aggregate_many_groups_spilled(self):
+        rows = [{'key': str(idx % 500)} for idx in range(2000)]
+        aggregator = aggregate.Aggregator([{'function': 'count'}], {})
+        result = dict(aggregate.hash_aggregate(
+            rows,
+            lambda row: row['key'],
+            aggregator,
+            memory_limit=2000
+        ))
+        self.assertEqual(len(result), 500)
+        self.assertTrue(
+            all(value == {'count(*)': 4} for value in result.values())
+        )
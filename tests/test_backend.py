@@ -0,0 +1,125 @@
+import datetime
+import os
+import tempfile
+import unittest
+from ..datatool import backend
+
+
+class TestBackend(unittest.TestCase):
+    def setUp(self):
+        self.headers = ['email', 'location', 'dob', 'age']
+        self.types = {
+            'email': 'string',
+            'location': 'string',
+            'dob': 'date',
+            'age': 'numeric'
+        }
+        rows = [
+            ('tony@stark.com', 'malibu', '29/05/1970', '45'),
+            ('hulk@stark.com', 'malibu', '18/12/1969', ''),
+            ('s.rodgers@avengers.com', 'new york', '04/07/1918', '97'),
+            ('thor@asgard.com', 'asgard', '01/01/1000', '9'),
+        ]
+        self.database = backend.SQLiteBackend(':memory:', create=True)
+        self.records = self.database.load(
+            self.headers,
+            self.types,
+            (dict(zip(self.headers, row)) for row in rows),
+            indexes=['age', 'dob'],
+            batch_size=3
+        )
+
+    def tearDown(self):
+        self.database.close()
+
+    def test_load_counts_records_and_keeps_types(self):
+        self.assertEqual(self.records, 4)
+        self.assertDictEqual(self.database.types, self.types)
+
+    def test_select_numeric_comparison_skips_empty_values(self):
+        rows = self.database.select(
+            ['email'], [{'field': 'age', 'condition': 'LESS', 'value': 50.0}]
+        )
+        self.assertListEqual(
+            [row['email'] for row in rows],
+            ['tony@stark.com', 'thor@asgard.com']
+        )
+
+    def test_select_date_comparison_returns_parsed_dates(self):
+        rows = list(self.database.select(
+            ['email', 'dob'],
+            [{
+                'field': 'dob',
+                'condition': 'BEFORE',
+                'value': datetime.datetime(1950, 1, 1)
+            }]
+        ))
+        self.assertListEqual(
+            [row['dob'] for row in rows],
+            [datetime.datetime(1918, 4, 7), datetime.datetime(1000, 1, 1)]
+        )
+
+    def test_select_order_and_dedupe_on(self):
+        rows = self.database.select(
+            ['location'], [], order=[('age', True)], dedupe_on=['location']
+        )
+        self.assertListEqual(
+            [row['location'] for row in rows],
+            ['new york', 'malibu', 'asgard']
+        )
+
+    def test_select_between_dates_on_string_field(self):
+        rows = self.database.select(['email'], [{
+            'field': 'location',
+            'condition': 'BETWEEN',
+            'value': (
+                datetime.datetime(1900, 1, 1),
+                datetime.datetime(2000, 1, 1)
+            )
+        }])
+        self.assertListEqual(list(rows), [])
+
+    def test_select_in_and_not_in_values(self):
+        rows = self.database.select(['email'], [
+            {
+                'field': 'location',
+                'condition': 'IN',
+                'value': frozenset(['malibu', 'asgard'])
+            },
+            {
+                'field': 'email',
+                'condition': 'NOT_IN',
+                'value': frozenset(['hulk@stark.com'])
+            }
+        ])
+        self.assertListEqual(
+            [row['email'] for row in rows],
+            ['tony@stark.com', 'thor@asgard.com']
+        )
+
+    def test_value_counts_in_first_seen_order(self):
+        self.assertEqual(
+            self.database.value_counts('location'),
+            (4, [('malibu', 2), ('new york', 1), ('asgard', 1)])
+        )
+
+    def test_reopened_database_reads_headers_and_types(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.db')
+            loader = backend.SQLiteBackend(path, create=True)
+            loader.load(self.headers, self.types, [], indexes=['email'])
+            loader.close()
+            database = backend.SQLiteBackend(path)
+            self.assertListEqual(database.headers, self.headers)
+            self.assertDictEqual(database.types, self.types)
+            database.close()
+
+    def test_unloaded_database_is_refused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.db')
+            with self.assertRaises(ValueError):
+                backend.SQLiteBackend(path)
+            self.assertFalse(os.path.exists(path))
+            backend.SQLiteBackend(path, create=True).close()
+            with self.assertRaises(ValueError):
+                backend.SQLiteBackend(path)
@@ -0,0 +1,37 @@
+import unittest
+from ..datatool.bloom import BloomFilter
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = BloomFilter(1000)
+        keys = ['key{idx}'.format(idx=idx) for idx in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+
+    def test_bloom_filter_add_reports_new_keys(self):
+        bloom = BloomFilter(100)
+        self.assertFalse(bloom.add(('tony@stark.com', 'malibu')))
+        self.assertTrue(bloom.add(('tony@stark.com', 'malibu')))
+
+    def test_bloom_filter_false_positive_rate_near_error_rate(self):
+        bloom = BloomFilter(1000, error_rate=0.01)
+        for idx in range(1000):
+            bloom.add(idx)
+        false_positives = sum(
+            1 for idx in range(1000, 11000) if idx in bloom
+        )
+        self.assertLess(false_positives / 10000, 0.05)
+
+    def test_bloom_filter_max_bits_caps_size_and_raises_error_rate(self):
+        bloom = BloomFilter(100000, error_rate=0.01)
+        capped = BloomFilter(100000, error_rate=0.01, max_bits=8000)
+        self.assertEqual(capped.size, 8000)
+        self.assertEqual(len(capped.bits), 1000)
+        self.assertLess(bloom.expected_error_rate, 0.011)
+        self.assertGreater(capped.expected_error_rate, 0.5)
+        keys = range(1000)
+        for key in keys:
+            capped.add(key)
+        self.assertTrue(all(key in capped for key in keys))
@@ -0,0 +1,88 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from ..datatool import cli
+from unittest.mock import patch
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.csv_example = (
+            "email, location, colour\n"
+            "tony@stark.com, malibu, gold\n"
+            "hulk@stark.com, malibu, green\n"
+            "s.rodgers@avengers.com, new york, blue\n"
+            "thor@asgard.com, asgard, red\n"
+        )
+        handle, self.filename = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as f:
+            f.write(self.csv_example)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def run_cli(self, argv, stdin=''):
+        stdout = io.StringIO()
+        with patch('sys.stdin', io.StringIO(stdin)):
+            with patch('sys.stdout', stdout):
+                status = cli.main(argv)
+        return status, stdout.getvalue()
+
+    def test_cli_query_reads_stdin_and_writes_stdout(self):
+        status, output = self.run_cli(
+            [
+                'query', '-f', 'email', 'colour',
+                '-w', json.dumps({
+                    'field': 'email',
+                    'condition': 'contains',
+                    'value': 'stark'
+                })
+            ],
+            stdin=self.csv_example
+        )
+        self.assertEqual(status, 0)
+        self.assertEqual(
+            output,
+            (
+                "email, colour\n"
+                "tony@stark.com,gold\n"
+                "hulk@stark.com,green\n"
+            )
+        )
+
+    def test_cli_query_output_pipes_into_stats(self):
+        _, output = self.run_cli(
+            ['query', self.filename, '-f', 'location']
+        )
+        status, stats = self.run_cli(
+            ['stats', '--field', 'location', '--return-type', '%'],
+            stdin=output
+        )
+        self.assertEqual(status, 0)
+        self.assertDictEqual(
+            json.loads(stats),
+            {
+                'data': {
+                    'malibu': 50.0,
+                    'new york': 25.0,
+                    'asgard': 25.0
+                }
+            }
+        )
+
+    def test_cli_invalid_where_json_returns_error_status(self):
+        with patch('sys.stderr', io.StringIO()):
+            status, _ = self.run_cli(
+                ['query', self.filename, '-f', 'email', '-w', '{email'],
+            )
+        self.assertEqual(status, 1)
+
+    def test_cli_invalid_field_returns_error_status(self):
+        with patch('sys.stderr', io.StringIO()) as stderr:
+            status, _ = self.run_cli(
+                ['stats', self.filename, '--field', 'toast'],
+            )
+        self.assertEqual(status, 1)
+        self.assertIn('toast', stderr.getvalue())
@@ -1,3 +1,4 @@
+import tempfile
 import unittest
 from ..datatool import converter
 
@@ -111,3 +112,81 @@ class TestConverter(unittest.TestCase):
         self.assertIn('weymouth', string)
         self.assertIn('|blue\t red|', string)
         self.assertIn('\t', string)
+
+    def test_has_encloser_detects_enclosed_sample(self):
+        self.assertTrue(
+            converter.has_encloser([self.invalid_data, self.valid_data], '\"')
+        )
+        self.assertFalse(converter.has_encloser([self.invalid_data], '\"'))
+
+    def test_make_splitter_returns_referenced_columns(self):
+        headers = converter.get_indexes(
+            data=self.valid_headers,
+            terminator=',',
+            encloser='\"'
+        )
+        for quoted in (True, False):
+            split = converter.make_splitter(
+                headers=headers,
+                columns=['location', 'colour'],
+                terminator=',',
+                encloser='\"',
+                quoted=quoted
+            )
+            self.assertDictEqual(
+                split(self.valid_data + '\n'),
+                {
+                    'location': 'weymouth',
+                    'colour': 'blue, red'
+                }
+            )
+
+    def test_make_splitter_unquoted_stops_after_last_column(self):
+        headers = converter.get_indexes(
+            data=self.valid_headers,
+            terminator=',',
+            encloser='\"'
+        )
+        split = converter.make_splitter(
+            headers=headers,
+            columns=['email'],
+            terminator=',',
+            encloser='\"',
+            quoted=False
+        )
+        self.assertDictEqual(
+            split("test@test.com, weymouth, blue\n"),
+            {'email': 'test@test.com'}
+        )
+
+    def test_make_splitter_invalid_data(self):
+        headers = converter.get_indexes(
+            data=self.valid_headers,
+            terminator=',',
+            encloser='\"'
+        )
+        for quoted in (True, False):
+            split = converter.make_splitter(
+                headers=headers,
+                columns=['colour'],
+                terminator=',',
+                encloser='\"',
+                quoted=quoted
+            )
+            with self.assertRaises(ValueError):
+                split("test@test.com, weymouth")
+
+    def test_convert_to_set_inline_values(self):
+        self.assertEqual(
+            converter.convert_to_set(['malibu ', 37, 'asgard']),
+            frozenset(['malibu', '37', 'asgard'])
+        )
+
+    def test_convert_to_set_file_of_values(self):
+        with tempfile.NamedTemporaryFile('w') as f:
+            f.write('tony@stark.com\n"thor@asgard.com"\n\n')
+            f.flush()
+            self.assertEqual(
+                converter.convert_to_set(f.name),
+                frozenset(['tony@stark.com', 'thor@asgard.com'])
+            )
@@ -1,8 +1,13 @@
+import io
+import os
+import tempfile
+import threading
+import time
 import unittest
 from dateutil.parser import parse
 from ..datatool.config.exceptions import ConditionTypeError, FieldHeaderError
 from ..datatool import DataTool
-from ..datatool import converter
+from ..datatool import converter, zonemap
 from unittest.mock import mock_open, patch
 
 
@@ -123,6 +128,35 @@ class TestDataTool(unittest.TestCase):
                 }
             )
 
+    def test_datatool_statistics_cache_info_reports_hits(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        with patch('builtins.open', self.mock_open_2):
+            stats = datatool.statistics(
+                field='location',
+                search={
+                    'regex': '[a-z]+'
+                    },
+                return_type='#',
+                top=3,
+                cache_info=True
+            )
+            self.assertDictEqual(
+                stats['cache'],
+                {
+                    'strategy': 'regex',
+                    'hits': 1,
+                    'misses': 3,
+                    'hit_rate': 0.25,
+                    'size': 3
+                }
+            )
+
     def test_datatool_statistics_no_matches_found(self):
         with patch('builtins.open', self.mock_open):
             with patch('os.path.exists', return_value=True):
@@ -391,3 +425,571 @@ class TestDataTool(unittest.TestCase):
         with patch('builtins.open', self.mock_open):
             with self.assertRaises(ValueError):
                 datatool.query(fields, where, match_all, outfile)
+
+    def test_datatool_query_order_by_writes_ordered_rows(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        outfile = io.StringIO()
+        with patch('builtins.open', self.mock_open_2):
+            result = datatool.query(
+                ['email', 'location'],
+                [],
+                True,
+                outfile,
+                order_by=['location', 'email DESC']
+            )
+        self.assertEqual(result['data']['records'], 4)
+        self.assertEqual(
+            outfile.getvalue(),
+            (
+                "email, location\n"
+                "thor@asgard.com,asgard\n"
+                "tony@stark.com,malibu\n"
+                "hulk@stark.com,malibu\n"
+                "s.rodgers@avengers.com,new york\n"
+            )
+        )
+
+    def test_datatool_query_order_by_invalid_field(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        with patch('builtins.open', self.mock_open_2):
+            with self.assertRaises(FieldHeaderError):
+                datatool.query(
+                    ['email'], [], True, io.StringIO(), order_by='occupation'
+                )
+
+    def test_datatool_group_by_counts_matching_rows(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        with patch('builtins.open', self.mock_open_2):
+            result = datatool.group_by(
+                'location',
+                [{'function': 'count'}, {'function': 'max', 'field': 'email'}],
+                where=[{
+                    'field': 'email',
+                    'condition': 'contains',
+                    'value': '.com'
+                }]
+            )
+        self.assertDictEqual(
+            result,
+            {
+                'data': {
+                    'malibu': {'count(*)': 2, 'max(email)': 'tony@stark.com'},
+                    'new york': {
+                        'count(*)': 1,
+                        'max(email)': 's.rodgers@avengers.com'
+                    },
+                    'asgard': {'count(*)': 1, 'max(email)': 'thor@asgard.com'}
+                }
+            }
+        )
+
+    def test_datatool_group_by_invalid_aggregate_field(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        with patch('builtins.open', self.mock_open_2):
+            with self.assertRaises(FieldHeaderError):
+                datatool.group_by(
+                    'location', [{'function': 'sum', 'field': 'age'}]
+                )
+
+    def test_datatool_join_left_writes_every_left_row(self):
+        heroes = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        heroes.write(self.csv_example)
+        heroes.flush()
+        customers = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        customers.write(
+            "email, name\n"
+            "tony@stark.com, Tony\n"
+            "thor@asgard.com, Thor\n"
+        )
+        customers.flush()
+        outfile = io.StringIO()
+        result = DataTool(filename=heroes.name).join(
+            DataTool(filename=customers.name),
+            on='email',
+            fields=['email', 'name', 'location'],
+            how='left',
+            outfile=outfile
+        )
+        heroes.close()
+        customers.close()
+        self.assertEqual(result['data']['records'], 4)
+        self.assertListEqual(
+            sorted(outfile.getvalue().splitlines()),
+            [
+                "email, name, location",
+                "hulk@stark.com,,malibu",
+                "s.rodgers@avengers.com,,new york",
+                "thor@asgard.com,Thor,asgard",
+                "tony@stark.com,Tony,malibu",
+            ]
+        )
+
+    def test_datatool_join_returns_rows_without_outfile(self):
+        heroes = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        heroes.write(self.csv_example)
+        heroes.flush()
+        customers = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        customers.write("email, name\nthor@asgard.com, Thor\n")
+        customers.flush()
+        result = DataTool(filename=heroes.name).join(
+            DataTool(filename=customers.name),
+            on='email',
+            fields=['email', 'name']
+        )
+        heroes.close()
+        customers.close()
+        self.assertDictEqual(
+            result,
+            {'data': [{'email': 'thor@asgard.com', 'name': 'Thor'}]}
+        )
+
+    def test_datatool_join_invalid_on_field(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        with self.assertRaises(FieldHeaderError):
+            datatool.join(
+                datatool, on=('email', 'occupation'), fields=['email'],
+                outfile=io.StringIO()
+            )
+
+    def test_datatool_query_dedupe_on_writes_first_of_each(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        outfile = io.StringIO()
+        with patch('builtins.open', self.mock_open_2):
+            with patch('os.path.getsize', return_value=1000):
+                result = datatool.query(
+                    ['email', 'location'],
+                    [],
+                    True,
+                    outfile,
+                    dedupe_on='location'
+                )
+        self.assertEqual(result['data']['records'], 3)
+        self.assertEqual(
+            outfile.getvalue(),
+            (
+                "email, location\n"
+                "tony@stark.com,malibu\n"
+                "s.rodgers@avengers.com,new york\n"
+                "thor@asgard.com,asgard\n"
+            )
+        )
+
+    def test_datatool_query_distinct_fields(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        outfile = io.StringIO()
+        with patch('builtins.open', self.mock_open_2):
+            with patch('os.path.getsize', return_value=1000):
+                result = datatool.query(
+                    ['location'], [], True, outfile, distinct=True
+                )
+        self.assertEqual(result['data']['records'], 3)
+
+    def test_datatool_query_between_numeric_values(self):
+        csv_example = (
+            "email, age\n"
+            "tony@stark.com, 45\n"
+            "hulk@stark.com, \n"
+            "thor@asgard.com, 1500\n"
+        )
+        with patch('builtins.open', self.create_mock_open(csv_example)):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        outfile = io.StringIO()
+        with patch('builtins.open', self.create_mock_open(csv_example)):
+            result = datatool.query(
+                ['email'],
+                [{'field': 'age', 'condition': 'between', 'value': [9, 50]}],
+                True,
+                outfile
+            )
+        self.assertEqual(result['data']['records'], 1)
+        self.assertEqual(outfile.getvalue(), "email\ntony@stark.com\n")
+
+    def test_datatool_to_sqlite_query_matches_scan(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write(self.csv_example)
+        source.flush()
+        database = tempfile.NamedTemporaryFile(suffix='.db')
+        where = [{'field': 'location', 'condition': 'equals',
+                  'value': 'malibu'}]
+        scanned = io.StringIO()
+        DataTool(filename=source.name).query(
+            ['email', 'colour'], where, True, scanned, order_by='colour'
+        )
+        datatool = DataTool(filename=source.name)
+        result = datatool.to_sqlite(database.name, indexes=['location'])
+        loaded = io.StringIO()
+        DataTool(filename=source.name, database=database.name).query(
+            ['email', 'colour'], where, True, loaded, order_by='colour'
+        )
+        datatool.backend.close()
+        source.close()
+        database.close()
+        self.assertEqual(result['data']['records'], 4)
+        self.assertEqual(loaded.getvalue(), scanned.getvalue())
+
+    def test_datatool_to_sqlite_dirty_numbers_match_scan(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write("email, age\n")
+        for idx in range(150):
+            source.write("{idx}@x.com, {age}\n".format(idx=idx, age=idx + 60))
+        source.write("a@x.com, 12abc\nb@x.com, n/a\nc@x.com, \n")
+        source.write("d@x.com, 12\n")
+        source.flush()
+        database = tempfile.NamedTemporaryFile(suffix='.db')
+        wheres = [
+            [{'field': 'age', 'condition': 'less', 'value': 20}],
+            [{'field': 'age', 'condition': 'between', 'value': [0, 50]}],
+            [{'field': 'age', 'condition': 'greater', 'value': 200}]
+        ]
+        scanned = []
+        for where in wheres:
+            outfile = io.StringIO()
+            DataTool(filename=source.name).query(
+                ['email'], where, True, outfile, order_by='age'
+            )
+            scanned.append(outfile.getvalue())
+        for sample_size in (10, None):
+            datatool = DataTool(filename=source.name)
+            datatool.to_sqlite(
+                database.name, indexes=['age'], sample_size=sample_size
+            )
+            loaded = []
+            for where in wheres:
+                outfile = io.StringIO()
+                datatool.query(['email'], where, True, outfile,
+                               order_by='age')
+                loaded.append(outfile.getvalue())
+            datatool.backend.close()
+            self.assertListEqual(loaded, scanned)
+        source.close()
+        database.close()
+        self.assertListEqual(
+            scanned[:2], ["email\nd@x.com\n", "email\nd@x.com\n"]
+        )
+
+    def test_datatool_to_sqlite_mixed_dates_match_scan(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write(
+            "email, note\na@x.com, 2020-01-05\nb@x.com, x\n"
+            "c@x.com, 2020-03-01\nd@x.com, 2021-01-01\n"
+        )
+        source.flush()
+        database = tempfile.NamedTemporaryFile(suffix='.db')
+        where = [{'field': 'note', 'condition': 'between',
+                  'value': ['2020-01-01', '2020-12-31']}]
+        scanned = io.StringIO()
+        DataTool(filename=source.name).query(
+            ['email'], [dict(where[0])], True, scanned
+        )
+        datatool = DataTool(filename=source.name)
+        datatool.to_sqlite(database.name)
+        loaded = io.StringIO()
+        datatool.query(['email'], where, True, loaded)
+        datatool.backend.close()
+        source.close()
+        database.close()
+        self.assertEqual(datatool.backend.types['note'], 'string')
+        self.assertEqual(scanned.getvalue(), "email\na@x.com\nc@x.com\n")
+        self.assertEqual(loaded.getvalue(), scanned.getvalue())
+
+    def test_datatool_query_numeric_equals_value_matches_text(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write("email, age\na@x.com, 45\nb@x.com, 12\n")
+        source.flush()
+        database = tempfile.NamedTemporaryFile(suffix='.db')
+        where = [
+            {'field': 'age', 'condition': 'equals', 'value': 45},
+            {'field': 'age', 'condition': 'contains', 'value': 4},
+            {'field': 'age', 'condition': 'not', 'value': 12}
+        ]
+        scanned = io.StringIO()
+        DataTool(filename=source.name).query(
+            ['email'], [dict(query) for query in where], True, scanned
+        )
+        datatool = DataTool(filename=source.name)
+        datatool.to_sqlite(database.name)
+        loaded = io.StringIO()
+        datatool.query(['email'], where, True, loaded)
+        datatool.backend.close()
+        source.close()
+        database.close()
+        self.assertEqual(scanned.getvalue(), "email\na@x.com\n")
+        self.assertEqual(loaded.getvalue(), scanned.getvalue())
+
+    def test_datatool_to_sqlite_validates_against_first_row(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write("email, age\na@x.com, 45\nb@x.com, 12abc\n")
+        source.flush()
+        database = tempfile.NamedTemporaryFile(suffix='.db')
+        datatool = DataTool(filename=source.name)
+        datatool.to_sqlite(database.name)
+        outfile = io.StringIO()
+        result = datatool.query(
+            ['email'],
+            [{'field': 'age', 'condition': 'greater', 'value': 40}],
+            True,
+            outfile
+        )
+        datatool.backend.close()
+        source.close()
+        database.close()
+        self.assertEqual(result['data']['records'], 1)
+        self.assertEqual(outfile.getvalue(), "email\na@x.com\n")
+
+    def test_datatool_database_of_other_headers_is_refused(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write(self.csv_example)
+        source.flush()
+        other = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        other.write("email, age\na@x.com, 45\n")
+        other.flush()
+        database = tempfile.NamedTemporaryFile(suffix='.db')
+        datatool = DataTool(filename=source.name)
+        datatool.to_sqlite(database.name)
+        datatool.backend.close()
+        with self.assertRaises(ValueError):
+            DataTool(filename=other.name, database=database.name)
+        loaded = DataTool(filename=source.name, database=database.name)
+        loaded.backend.close()
+        source.close()
+        other.close()
+        database.close()
+
+    def test_datatool_to_sqlite_invalid_index_field(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        with self.assertRaises(FieldHeaderError):
+            datatool.to_sqlite(':memory:', indexes=['occupation'])
+
+    def test_datatool_statistics_sample_reports_intervals(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write("email, location\n")
+        for idx in range(2000):
+            source.write("{idx}@stark.com, {location}\n".format(
+                idx=idx, location='malibu' if idx % 4 else 'asgard'
+            ))
+        source.flush()
+        stats = DataTool(filename=source.name).statistics(
+            field='location',
+            search={'regex': '.*'},
+            return_type='%',
+            top=None,
+            sample=400,
+            seed=1
+        )
+        source.close()
+        self.assertEqual(stats['sample']['rows'], 400)
+        self.assertEqual(stats['sample']['method'], 'seek')
+        low, high = stats['intervals']['asgard']
+        self.assertLess(low, 25)
+        self.assertGreater(high, 25)
+        self.assertLess(abs(stats['data']['malibu'] - 75), 10)
+
+    def test_datatool_follow_writes_appended_matches(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write(self.csv_example)
+        source.flush()
+        datatool = DataTool(filename=source.name)
+        stop = threading.Event()
+        outfile = io.StringIO()
+        result = {}
+        follower = threading.Thread(target=lambda: result.update(
+            datatool.follow(
+                ['email'],
+                [{'field': 'location', 'condition': 'equals',
+                  'value': 'malibu'}],
+                True,
+                outfile,
+                from_start=True,
+                stop=stop,
+                poll_interval=0.001,
+                inotify=False
+            )
+        ))
+        follower.start()
+        source.write("pepper@stark.com, malibu, white\n")
+        source.write("loki@asgard.com, asgard, green\n")
+        source.flush()
+        for _ in range(1000):
+            if outfile.getvalue().count('\n') == 4:
+                break
+            time.sleep(0.005)
+        stop.set()
+        follower.join()
+        source.close()
+        self.assertEqual(result['data']['records'], 3)
+        self.assertEqual(
+            outfile.getvalue(),
+            "email\ntony@stark.com\nhulk@stark.com\npepper@stark.com\n"
+        )
+
+    def test_datatool_query_in_values_file(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write(self.csv_example)
+        source.flush()
+        values = tempfile.NamedTemporaryFile('w', suffix='.txt')
+        values.write("tony@stark.com\nthor@asgard.com\n")
+        values.flush()
+        where = [
+            {'field': 'email', 'condition': 'not_in', 'value': values.name},
+            {'field': 'location', 'condition': 'in',
+             'value': ['malibu', 'new york']}
+        ]
+        outfile = io.StringIO()
+        result = DataTool(filename=source.name).query(
+            ['email'], where, True, outfile
+        )
+        source.close()
+        values.close()
+        self.assertEqual(result['data']['records'], 2)
+        self.assertEqual(
+            outfile.getvalue(),
+            "email\nhulk@stark.com\ns.rodgers@avengers.com\n"
+        )
+
+    def test_datatool_query_in_invalid_value(self):
+        with patch('builtins.open', self.mock_open):
+            with patch('os.path.exists', return_value=True):
+                datatool = DataTool(
+                    filename='path/to/file.csv',
+                    terminator=',',
+                    encloser='\"'
+                )
+        with patch('builtins.open', self.mock_open_2):
+            with self.assertRaises(ConditionTypeError):
+                datatool.query(
+                    ['email'],
+                    [{'field': 'location', 'condition': 'in', 'value': 3}],
+                    True,
+                    io.StringIO()
+                )
+
+    def test_datatool_query_skips_blocks_by_zone_map(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'events.csv')
+            with open(filename, 'w') as f:
+                f.write("email, age\n")
+                for idx in range(200):
+                    f.write("{idx}@stark.com, {idx}\n".format(idx=idx))
+            where = [{'field': 'age', 'condition': 'between',
+                      'value': [150, 152]}]
+            scanned = io.StringIO()
+            DataTool(filename=filename).query(
+                ['email'], [dict(where[0])], True, scanned
+            )
+            result = DataTool(filename=filename).build_zone_map(
+                ['age'], block_size=256
+            )
+            mapped = io.StringIO()
+            with patch.object(
+                zonemap.ZoneMap, 'lines', autospec=True,
+                side_effect=zonemap.ZoneMap.lines
+            ) as lines:
+                DataTool(filename=filename).query(
+                    ['email'], where, True, mapped
+                )
+        self.assertGreater(result['data']['blocks'], 10)
+        # Only the block holding the range is read
+        self.assertEqual(len(lines.call_args.args[2]), 1)
+        self.assertEqual(mapped.getvalue(), scanned.getvalue())
+        self.assertEqual(
+            mapped.getvalue(),
+            "email\n150@stark.com\n151@stark.com\n152@stark.com\n"
+        )
+
+    def test_datatool_query_ignores_zone_map_of_rewritten_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'events.csv')
+            with open(filename, 'w') as f:
+                f.write("email, age\na@x.com, 100\n")
+                for idx in range(2000):
+                    f.write("{idx}@stark.com, {idx:03}\n".format(
+                        idx=idx % 900
+                    ))
+            DataTool(filename=filename).build_zone_map(
+                ['age'], block_size=256
+            )
+            with open(filename, 'r+') as f:
+                f.seek(len("email, age\na@x.com, "))
+                f.write("999")
+            outfile = io.StringIO()
+            DataTool(filename=filename).query(
+                ['email'],
+                [{'field': 'age', 'condition': 'greater', 'value': 900}],
+                True,
+                outfile
+            )
+        self.assertEqual(outfile.getvalue(), "email\na@x.com\n")
+
+    def test_datatool_query_pipeline_matches_sequential_scan(self):
+        source = tempfile.NamedTemporaryFile('w', suffix='.csv')
+        source.write(self.csv_example)
+        source.flush()
+        where = [{'field': 'location', 'condition': 'not',
+                  'value': 'asgard'}]
+        sequential = io.StringIO()
+        DataTool(filename=source.name).query(
+            ['email', 'colour'], [dict(where[0])], True, sequential
+        )
+        pipelined = io.StringIO()
+        result = DataTool(filename=source.name).query(
+            ['email', 'colour'], where, True, pipelined, pipeline=True
+        )
+        source.close()
+        self.assertEqual(result['data']['records'], 3)
+        self.assertEqual(pipelined.getvalue(), sequential.getvalue())
+        self.assertSetEqual(
+            set(result['pipeline']), {'reader', 'processor', 'writer'}
+        )
@@ -0,0 +1,42 @@
+import unittest
+from operator import itemgetter
+from unittest.mock import patch
+from ..datatool import distinct
+
+
+class TestDistinct(unittest.TestCase):
+    def setUp(self):
+        self.records = [
+            (str(idx % 250), idx) for idx in range(1000)
+        ]
+        self.expected = [(str(idx), idx) for idx in range(250)]
+
+    def test_distinct_keeps_first_record_of_each_key(self):
+        result = list(distinct.distinct(self.records, key=itemgetter(0)))
+        self.assertListEqual(result, self.expected)
+
+    def test_distinct_spilled_verification_is_exact(self):
+        # A tiny filter and memory limit send most keys through the spill
+        # files, which must still only keep the first of each key
+        result = distinct.distinct(
+            self.records,
+            key=itemgetter(0),
+            capacity=10,
+            memory_limit=1000
+        )
+        self.assertListEqual(sorted(result, key=itemgetter(1)), self.expected)
+
+    def test_distinct_bloom_filter_is_bounded_by_memory_limit(self):
+        with patch.object(
+            distinct, 'BloomFilter', wraps=distinct.BloomFilter
+        ) as bloom:
+            result = distinct.distinct(
+                self.records,
+                key=itemgetter(0),
+                capacity=10 ** 8,
+                memory_limit=4000
+            )
+            self.assertListEqual(
+                sorted(result, key=itemgetter(1)), self.expected
+            )
+        self.assertEqual(bloom.call_args.kwargs['max_bits'], 8000)
@@ -0,0 +1,73 @@
+import re
+import unittest
+from ..datatool import extractor
+
+
+class TestExtractor(unittest.TestCase):
+    def test_analyse_pattern_match_all(self):
+        self.assertEqual(
+            extractor.analyse_pattern(re.compile('.*')),
+            'match_all'
+        )
+
+    def test_analyse_pattern_literal(self):
+        self.assertEqual(
+            extractor.analyse_pattern(re.compile('stark')),
+            'literal'
+        )
+
+    def test_analyse_pattern_with_grouping_is_regex(self):
+        self.assertEqual(
+            extractor.analyse_pattern(re.compile('stark'), group_idx=0),
+            'regex'
+        )
+
+    def test_analyse_pattern_with_flags_is_regex(self):
+        self.assertEqual(
+            extractor.analyse_pattern(re.compile('stark', re.IGNORECASE)),
+            'regex'
+        )
+
+    def test_compile_search_invalid_regex_raises_exception(self):
+        with self.assertRaises(TypeError):
+            extractor.compile_search({'regex': '(['})
+
+    def test_compile_search_fast_paths_match_regex_results(self):
+        values = ['tony@stark.com', '', 'multi\nline', 'thor@asgard.com']
+        for pattern in ('.*', '^.*', 'stark', '@'):
+            extract = extractor.compile_search({'regex': pattern})
+            for value in values:
+                match = re.search(pattern, value)
+                self.assertEqual(
+                    extract(value),
+                    match.group() if match else None
+                )
+
+    def test_compile_search_group_idx_returns_group(self):
+        extract = extractor.compile_search({
+            'regex': "@([a-z0-9]+(-[a-z0-9]+)*)\\.+[a-z]{2,}$",
+            'group_idx': 0
+        })
+        self.assertEqual(extract('tony@stark.com'), 'stark')
+        self.assertIsNone(extract('not an email'))
+
+    def test_cache_report_counts_repeated_values(self):
+        extract = extractor.compile_search({'regex': '[a-z]+'})
+        for value in ('malibu', 'malibu', 'malibu', 'asgard'):
+            extract(value)
+        self.assertDictEqual(
+            extractor.cache_report(extract),
+            {
+                'strategy': 'regex',
+                'hits': 2,
+                'misses': 2,
+                'hit_rate': 0.5,
+                'size': 2
+            }
+        )
+
+    def test_cache_report_bounded_by_cache_size(self):
+        extract = extractor.compile_search({'regex': '[a-z]+'}, cache_size=2)
+        for value in ('malibu', 'asgard', 'new york'):
+            extract(value)
+        self.assertEqual(extractor.cache_report(extract)['size'], 2)
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import threading
+import unittest
+from ..datatool import follow
+
+
+class ScriptedWatcher():
+    """Runs the next step of a script each time the follower waits, setting
+    stop once the script runs out"""
+
+    def __init__(self, steps, stop):
+        self.steps = list(steps)
+        self.stop = stop
+
+    def wait(self):
+        if self.steps:
+            self.steps.pop(0)()
+        else:
+            self.stop.set()
+        return True
+
+    def reset(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class TestFollow(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'live.csv')
+        self.write('w', 'email, location\nold@stark.com, malibu\n')
+        self.stop = threading.Event()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, mode, data, path=None):
+        with open(path or self.path, mode) as f:
+            f.write(data)
+
+    def follow(self, steps, from_start=False):
+        return list(follow.follow_lines(
+            self.path,
+            from_start=from_start,
+            stop=self.stop,
+            watcher=ScriptedWatcher(steps, self.stop),
+            encoding='utf-8'
+        ))
+
+    def test_follow_lines_yields_appended_whole_lines(self):
+        lines = self.follow([
+            lambda: self.write('a', 'tony@stark.com, malibu\nthor@'),
+            lambda: self.write('a', 'asgard.com, asgard\n'),
+        ])
+        self.assertListEqual(
+            lines,
+            ['tony@stark.com, malibu\n', 'thor@asgard.com, asgard\n']
+        )
+
+    def test_follow_lines_from_start_skips_header(self):
+        self.assertListEqual(
+            self.follow([], from_start=True), ['old@stark.com, malibu\n']
+        )
+
+    def test_follow_lines_follows_truncation(self):
+        lines = self.follow([
+            lambda: self.write('w', 'email, location\n'),
+            lambda: self.write('a', 'tony@stark.com, malibu\n'),
+        ])
+        self.assertListEqual(lines, ['tony@stark.com, malibu\n'])
+
+    def test_follow_lines_ignores_touch(self):
+        lines = self.follow([
+            lambda: self.write('a', 'tony@stark.com, malibu\n'),
+            lambda: os.utime(self.path, ns=(0, 10 ** 9)),
+            lambda: os.utime(self.path, ns=(0, 2 * 10 ** 9)),
+        ], from_start=True)
+        self.assertListEqual(
+            lines, ['old@stark.com, malibu\n', 'tony@stark.com, malibu\n']
+        )
+
+    def test_follow_lines_follows_rotation(self):
+        def rotate():
+            self.write('a', 'hulk@stark.com, malibu\n')
+            os.rename(self.path, self.path + '.1')
+            self.write('w', 'email, location\nthor@asgard.com, asgard\n')
+        lines = self.follow([rotate])
+        self.assertListEqual(
+            lines,
+            ['hulk@stark.com, malibu\n', 'thor@asgard.com, asgard\n']
+        )
+
+    def test_poll_watcher_backs_off_and_resets(self):
+        watcher = follow.PollWatcher(
+            self.path, poll_interval=0.001, max_interval=0.004
+        )
+        for _ in range(4):
+            watcher.wait()
+        self.assertEqual(watcher.interval, 0.004)
+        watcher.reset()
+        self.assertEqual(watcher.interval, 0.001)
@@ -0,0 +1,100 @@
+import unittest
+from unittest.mock import patch
+from ..datatool import join
+
+
+class TestJoin(unittest.TestCase):
+    def setUp(self):
+        self.orders = [
+            ('tony@stark.com', ('tony@stark.com', 'suit')),
+            ('hulk@stark.com', ('hulk@stark.com', 'trousers')),
+            ('tony@stark.com', ('tony@stark.com', 'arc reactor')),
+            (None, ('', 'hammer')),
+        ]
+        self.customers = [
+            ('tony@stark.com', ('Tony', )),
+            ('thor@asgard.com', ('Thor', )),
+            ('hulk@stark.com', ('Bruce', )),
+        ]
+        self.inner = [
+            (('tony@stark.com', 'suit'), ('Tony', )),
+            (('hulk@stark.com', 'trousers'), ('Bruce', )),
+            (('tony@stark.com', 'arc reactor'), ('Tony', )),
+        ]
+        self.left = self.inner + [(('', 'hammer'), None)]
+
+    def test_hash_join_inner_either_build_side(self):
+        self.assertListEqual(
+            sorted(join.hash_join(self.customers, self.orders)),
+            sorted(self.inner)
+        )
+        self.assertListEqual(
+            sorted(join.hash_join(
+                self.orders, self.customers, build_is_left=True
+            )),
+            sorted(self.inner)
+        )
+
+    def test_hash_join_left_either_build_side(self):
+        key = repr
+        self.assertListEqual(
+            sorted(
+                join.hash_join(self.customers, self.orders, left_outer=True),
+                key=key
+            ),
+            sorted(self.left, key=key)
+        )
+        self.assertListEqual(
+            sorted(
+                join.hash_join(
+                    self.orders, self.customers,
+                    build_is_left=True, left_outer=True
+                ),
+                key=key
+            ),
+            sorted(self.left, key=key)
+        )
+
+    def test_hash_join_grace_matches_in_memory(self):
+        left = [(str(idx % 300), (idx, )) for idx in range(1200)]
+        right = [(str(idx), ('r' + str(idx), )) for idx in range(600)]
+        expected = sorted(join.hash_join(right, left, left_outer=True))
+        for build_is_left in (False, True):
+            build, probe = (left, right) if build_is_left else (right, left)
+            result = join.hash_join(
+                build, probe,
+                build_is_left=build_is_left,
+                left_outer=True,
+                memory_limit=2000
+            )
+            self.assertListEqual(sorted(result), expected)
+        self.assertEqual(len(expected), 1200)
+
+    def test_hash_join_single_hot_key_is_not_repartitioned(self):
+        build = [('tony@stark.com', (idx, )) for idx in range(500)]
+        probe = [('tony@stark.com', ('Tony', ))]
+        with patch.object(
+            join, '_grace_join', wraps=join._grace_join
+        ) as grace_join:
+            result = list(join.hash_join(build, probe, memory_limit=100))
+        self.assertEqual(len(result), 500)
+        grace_join.assert_not_called()
+
+    def test_hash_join_empty_build_keys_are_not_held(self):
+        build = [(None, (idx, )) for idx in range(500)]
+        build.append(('tony@stark.com', ('suit', )))
+        probe = [('tony@stark.com', ('Tony', )), (None, ('Nobody', ))]
+        with patch.object(
+            join, '_grace_join', wraps=join._grace_join
+        ) as grace_join:
+            inner = list(join.hash_join(build, probe, memory_limit=100))
+            left = list(join.hash_join(
+                build, probe,
+                build_is_left=True,
+                left_outer=True,
+                memory_limit=100
+            ))
+        grace_join.assert_not_called()
+        self.assertListEqual(inner, [(('Tony', ), ('suit', ))])
+        self.assertEqual(len(left), 501)
+        self.assertIn((('suit', ), ('Tony', )), left)
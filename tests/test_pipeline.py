@@ -0,0 +1,73 @@
+import io
+import time
+import unittest
+from ..datatool import pipeline
+
+
+class SlowSource(io.StringIO):
+    """A source that takes a while to read each block"""
+
+    def read(self, size=-1):
+        time.sleep(0.01)
+        return super().read(size)
+
+
+class FailingSink():
+    def write(self, data):
+        raise OSError('disk full')
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.data = ''.join(
+            'line{idx}\n'.format(idx=idx) for idx in range(1000)
+        ) + 'last'
+
+    def test_read_splits_blocks_into_whole_lines(self):
+        flow = pipeline.Pipeline(block_size=7, depth=2)
+        lines = list(flow.read(io.StringIO(self.data)))
+        self.assertEqual(len(lines), 1001)
+        self.assertEqual(''.join(lines), self.data)
+        self.assertEqual(lines[1], 'line1\n')
+
+    def test_read_batches_an_iterable_of_lines(self):
+        flow = pipeline.Pipeline(depth=2, batch_size=3)
+        self.assertListEqual(list(flow.read(iter('abcdefg'))), list('abcdefg'))
+
+    def test_write_batches_lines_in_order(self):
+        sink = io.StringIO()
+        flow = pipeline.Pipeline(depth=2, batch_size=10)
+        written = flow.write(
+            sink, (line.upper() for line in flow.read(io.StringIO(self.data)))
+        )
+        self.assertEqual(written, 1001)
+        self.assertEqual(sink.getvalue(), self.data.upper())
+
+    def test_report_shows_slow_reads_starve_the_processor(self):
+        flow = pipeline.Pipeline(block_size=1024, depth=2)
+        flow.write(io.StringIO(), flow.read(SlowSource(self.data)))
+        report = flow.report()
+        self.assertGreater(report['processor']['starved'], 0.05)
+        self.assertEqual(report['reader']['blocked'], 0.0)
+
+    def test_report_shows_slow_processing_blocks_the_reader(self):
+        def process(lines):
+            for line in lines:
+                time.sleep(0.0001)
+                yield line
+        flow = pipeline.Pipeline(block_size=16, depth=1)
+        flow.write(io.StringIO(), process(flow.read(io.StringIO(self.data))))
+        self.assertGreater(flow.report()['reader']['blocked'], 0.0)
+
+    def test_reader_errors_are_raised_in_the_processor(self):
+        def source():
+            yield 'line\n'
+            raise ValueError('bad line')
+        flow = pipeline.Pipeline()
+        with self.assertRaises(ValueError):
+            flow.write(io.StringIO(), flow.read(source()))
+
+    def test_writer_errors_are_raised_in_the_processor(self):
+        flow = pipeline.Pipeline(depth=1, batch_size=1)
+        with self.assertRaises(OSError):
+            flow.write(FailingSink(), flow.read(io.StringIO(self.data)))
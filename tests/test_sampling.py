@@ -0,0 +1,56 @@
+import io
+import random
+import unittest
+from ..datatool import sampling
+
+
+class TestSampling(unittest.TestCase):
+    def test_reservoir_counts_every_item(self):
+        picked, total = sampling.reservoir(
+            range(100000), 50, random.Random(1)
+        )
+        self.assertEqual(total, 100000)
+        self.assertEqual(len(picked), 50)
+        self.assertEqual(len(set(picked)), 50)
+
+    def test_reservoir_keeps_everything_when_short(self):
+        self.assertEqual(
+            sampling.reservoir(iter('abc'), 5, random.Random(1)),
+            (['a', 'b', 'c'], 3)
+        )
+
+    def test_reservoir_is_close_to_uniform(self):
+        rng = random.Random(2)
+        halves = [0, 0]
+        for _ in range(200):
+            picked, _ = sampling.reservoir(range(1000), 10, rng)
+            for item in picked:
+                halves[item >= 500] += 1
+        self.assertLess(abs(halves[0] - halves[1]), 200)
+
+    def test_seek_lines_returns_whole_lines(self):
+        data = b'header\n' + b''.join(
+            'line{idx}\n'.format(idx=idx).encode() for idx in range(100)
+        )
+        f = io.BytesIO(data)
+        lines, length = sampling.seek_lines(
+            f, 7, len(data), 500, random.Random(3), encoding='utf-8'
+        )
+        self.assertEqual(len(lines), 500)
+        self.assertTrue(all(
+            line.startswith('line') and line.endswith('\n')
+            for line in lines
+        ))
+        self.assertTrue(6 <= length <= 7)
+
+    def test_wilson_interval_contains_proportion(self):
+        low, high = sampling.wilson_interval(30, 100)
+        self.assertLess(low, 0.3)
+        self.assertGreater(high, 0.3)
+        self.assertAlmostEqual(low, 0.2189, places=3)
+        self.assertAlmostEqual(high, 0.3958, places=3)
+
+    def test_wilson_interval_whole_population_is_exact(self):
+        self.assertEqual(
+            sampling.wilson_interval(30, 100, population=100), (0.3, 0.3)
+        )
@@ -0,0 +1,73 @@
+import random
+import unittest
+from operator import itemgetter
+from unittest.mock import patch
+from ..datatool import spill
+
+
+class TestSpill(unittest.TestCase):
+    def test_spill_file_reads_back_records_in_order(self):
+        spill_file = spill.SpillFile()
+        records = [('tony', 1), ('hulk', 2.5), ('thor', None)]
+        for record in records:
+            spill_file.write(record)
+        self.assertListEqual(list(spill_file), records)
+        # reading again starts from the beginning
+        self.assertListEqual(list(spill_file), records)
+        spill_file.close()
+
+    def test_order_key_mixed_directions(self):
+        values = [(1, 'b'), (2, 'a'), (1, 'a'), (2, 'b')]
+        ordered = sorted(
+            values,
+            key=lambda value: spill.OrderKey(value, (False, True))
+        )
+        self.assertListEqual(ordered, [(1, 'b'), (1, 'a'), (2, 'b'), (2, 'a')])
+
+    def test_external_sort_in_memory_matches_sorted(self):
+        records = [random.randint(0, 100) for _ in range(500)]
+        self.assertListEqual(
+            list(spill.external_sort(records)),
+            sorted(records)
+        )
+
+    def test_external_sort_spilled_runs_match_sorted(self):
+        records = [(random.randint(0, 20), idx) for idx in range(500)]
+        for reverse in (False, True):
+            result = list(spill.external_sort(
+                records,
+                key=itemgetter(0),
+                reverse=reverse,
+                memory_limit=1000
+            ))
+            # stable, so equal keys keep their arrival order
+            self.assertListEqual(
+                result,
+                sorted(records, key=itemgetter(0), reverse=reverse)
+            )
+
+    def test_external_sort_bounds_open_runs(self):
+        opened = set()
+        most = []
+
+        class CountedSpillFile(spill.SpillFile):
+            def __init__(self, directory=None):
+                super().__init__(directory)
+                opened.add(self)
+                most.append(len(opened))
+
+            def close(self):
+                opened.discard(self)
+                super().close()
+
+        records = [(random.randint(0, 20), idx) for idx in range(3000)]
+        with patch.object(spill, 'SpillFile', CountedSpillFile):
+            with patch.object(spill, 'MAX_MERGE', 3):
+                result = list(spill.external_sort(
+                    records, key=itemgetter(0), memory_limit=1000
+                ))
+        self.assertListEqual(result, sorted(records, key=itemgetter(0)))
+        # Hundreds of runs are written, but only a few per level are open
+        self.assertGreater(len(most), 200)
+        self.assertLess(max(most), 20)
+        self.assertSetEqual(opened, set())
@@ -0,0 +1,122 @@
+import datetime
+import io
+import os
+import tempfile
+import unittest
+from ..datatool import converter, zonemap
+
+
+class TestZoneMap(unittest.TestCase):
+    def setUp(self):
+        self.header = b'ts, age\n'
+        self.data = self.header + (
+            b'2020-01-01, 10\n'
+            b'2020-01-02, 20\n'
+            b'2020-02-01, \n'
+            b'2020-02-02, 40\n'
+            b'2020-03-01, nan\n'
+            b'2020-03-02, 60\n'
+        )
+        self.split = converter.make_splitter(
+            headers={'ts': 0, 'age': 1},
+            columns=['ts', 'age'],
+            terminator=',',
+            encloser='"'
+        )
+        f = io.BytesIO(self.data)
+        f.readline()
+        self.zones = zonemap.ZoneMap.build(
+            f, self.split, ['ts', 'age'],
+            {'ts': 'date', 'age': 'numeric'},
+            block_size=28, encoding='utf-8'
+        )
+
+    def test_build_summarises_blocks_of_whole_lines(self):
+        self.assertEqual(len(self.zones.blocks), 3)
+        self.assertEqual(self.zones.blocks[0]['offset'], len(self.header))
+        self.assertEqual(self.zones.covered, len(self.data))
+        self.assertDictEqual(
+            self.zones.blocks[1]['fields'],
+            {
+                'ts': {
+                    'text': ['2020-02-01', '2020-02-02'],
+                    'date': ['2020-02-01T00:00:00', '2020-02-02T00:00:00']
+                },
+                'age': {'text': ['', '40'], 'numeric': [40.0, 40.0]}
+            }
+        )
+        self.assertEqual(
+            self.zones.blocks[2]['fields']['age']['numeric'], [60.0, 60.0]
+        )
+
+    def test_candidate_blocks_skip_out_of_range_blocks(self):
+        after = {
+            'field': 'ts',
+            'condition': 'AFTER',
+            'value': datetime.datetime(2020, 2, 15)
+        }
+        less = {'field': 'age', 'condition': 'LESS', 'value': 30.0}
+        self.assertListEqual(
+            self.zones.candidate_blocks([after]), self.zones.blocks[2:]
+        )
+        self.assertListEqual(self.zones.candidate_blocks([after, less]), [])
+        self.assertListEqual(
+            self.zones.candidate_blocks([after, less], match_all=False),
+            [self.zones.blocks[0], self.zones.blocks[2]]
+        )
+
+    def test_candidate_blocks_keep_blocks_of_unmapped_conditions(self):
+        where = [
+            {'field': 'age', 'condition': 'CONTAINS', 'value': '9'},
+            {'field': 'age', 'condition': 'BETWEEN', 'value': (45.0, 50.0)}
+        ]
+        self.assertListEqual(
+            self.zones.candidate_blocks(where[:1]), self.zones.blocks
+        )
+        self.assertListEqual(self.zones.candidate_blocks(where[1:]), [])
+
+    def test_lines_reads_candidate_blocks_then_the_rest(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'data.csv')
+            with open(filename, 'wb') as f:
+                f.write(self.data + b'2020-04-01, 70\n')
+            self.assertTrue(self.zones.fresh(filename))
+            self.assertListEqual(
+                list(self.zones.lines(
+                    filename, self.zones.blocks[1:2], encoding='utf-8'
+                )),
+                ['2020-02-01, \n', '2020-02-02, 40\n', '2020-04-01, 70\n']
+            )
+            with open(filename, 'wb') as f:
+                f.write(self.data.replace(b'60', b'61'))
+            self.assertFalse(self.zones.fresh(filename))
+
+    def test_save_and_load_round_trip(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.csv.zonemap')
+            self.zones.save(path)
+            loaded = zonemap.ZoneMap.load(path)
+        self.assertListEqual(loaded.blocks, self.zones.blocks)
+        self.assertEqual(loaded.checksum, self.zones.checksum)
+
+    def test_fresh_sees_a_same_size_rewrite_of_the_middle(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'data.csv')
+            with open(filename, 'wb') as f:
+                f.write(self.header)
+                for idx in range(1000):
+                    f.write(b'2020-01-01, %04d\n' % idx)
+            with open(filename, 'rb') as f:
+                f.readline()
+                zones = zonemap.ZoneMap.build(
+                    f, self.split, ['age'], {'age': 'numeric'},
+                    encoding='utf-8'
+                )
+            self.assertTrue(zones.fresh(filename))
+            modified = os.stat(filename).st_mtime_ns
+            with open(filename, 'r+b') as f:
+                f.seek(len(self.header) + 500 * 17)
+                f.write(b'2020-01-01, 9999\n')
+            os.utime(filename, ns=(modified, modified + 10 ** 9))
+            # Beyond the checked bytes at the start and end
+            self.assertFalse(zones.fresh(filename))